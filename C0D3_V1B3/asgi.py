@@ -2,6 +2,8 @@
 ASGI config for C0D3_V1B3 project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The application is wrapped to send 103 Early Hints for the critical assets
+when the server supports it (see ``blog.middleware``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +16,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'C0D3_V1B3.settings')
 
 application = get_asgi_application()
+
+from blog.middleware import EarlyHintsMiddleware  # noqa: E402 (needs configured settings)
+
+application = EarlyHintsMiddleware(application)
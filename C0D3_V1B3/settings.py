@@ -39,7 +39,8 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'blog',
-    'markdownify',
+    # 'markdownify' is not installed as an app: its template library imports
+    # markdown and bleach at startup. blog.templatetags.blog_markdown loads it lazily.
     'mdeditor',
 ]
 
@@ -51,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'blog.middleware.PreloadMiddleware',
 ]
 
 ROOT_URLCONF = 'C0D3_V1B3.urls'
@@ -81,6 +83,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # On disk rather than in memory, so tests can check what other processes see
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -145,7 +149,15 @@ MARKDOWNIFY = {
             'extra',
             'codehilite',
             'tables',
+            'toc',  # Heading anchors and permalinks, read back by blog.outline
         ],
+        "MARKDOWN_EXTENSION_CONFIGS": {
+            'toc': {
+                'permalink': True,
+                'permalink_class': 'headerlink',
+                'permalink_title': 'Link to this section',
+            },
+        },
         "STRIP": False,
         "WHITELIST_TAGS": [
             'a', 'abbr', 'acronym', 'b', 'blockquote', 'code', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'i',
@@ -188,3 +200,83 @@ MDEDITOR_CONFIGS = {
         'lineNumbers': True
     }
 }
+
+# Sitemap Configuration
+SITEMAP_CHUNK_SIZE = 5000  # URLs per sitemap chunk
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24  # Seconds to keep an unchanged chunk cached
+
+# Related Posts Configuration
+RELATED_POSTS_COUNT = 5  # Related posts stored and shown per post
+RELATED_POSTS_CATEGORY_WEIGHT = 0.4  # Weight of shared categories in the score
+RELATED_POSTS_CONTENT_WEIGHT = 0.6  # Weight of content similarity in the score
+RELATED_POSTS_QUERY_TERMS = 25  # Top terms of a changed post used to find the posts to score it against
+
+# Page View Configuration
+PAGEVIEW_FLUSH_INTERVAL = 30  # Seconds between writes of buffered view counts
+POPULAR_POSTS_DAYS = 7  # Window used for the "most read" sidebar list
+POPULAR_POSTS_COUNT = 5  # Posts shown in the "most read" sidebar list
+POPULAR_POSTS_CACHE_TIMEOUT = 300  # Seconds to cache the "most read" list
+
+# Comment Spam Protection
+COMMENT_RATE_LIMITS = {
+    'ip': (5, 300),  # Comments allowed per IP address per 5 minutes
+    'post': (30, 300),  # Comments allowed per post per 5 minutes
+}
+COMMENT_DUPLICATE_WINDOW = 60 * 60 * 24  # Seconds an identical comment is rejected for
+COMMENT_TRUST_X_FORWARDED_FOR = False  # Only enable behind a proxy that sets the header
+COMMENTS_PAGE_SIZE = 20  # Comments rendered with the post and per "load more" batch
+COMMENT_RETENTION_DAYS = 30  # Days unapproved comments are kept before prune_comments deletes them
+
+# Caching Configuration
+CACHE_LOCAL_MAX_ENTRIES = 1000  # Entries kept in each process's in-memory LRU
+CACHE_LOCAL_TIMEOUT = 5  # Seconds a process trusts its LRU before checking the shared cache
+CACHE_STALE_TIMEOUT = 60 * 60  # Seconds an expired value may still be served
+CACHE_LOCK_TIMEOUT = 30  # Seconds a recompute lock is held at most
+CACHE_LOCK_WAIT = 2  # Seconds to wait for another worker's result when nothing is cached
+SIDEBAR_CACHE_TIMEOUT = 60 * 10  # Seconds categories and archives stay fresh
+MARKDOWN_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # Seconds rendered Markdown stays fresh
+
+# Markdown Rendering Limits
+MARKDOWN_MAX_INPUT_SIZE = 200000  # Characters; longer posts are shown as plain text
+MARKDOWN_RENDER_POOL_SIZE = 2  # Processes rendering Markdown; 0 renders in the request thread without a time limit
+MARKDOWN_RENDER_TIMEOUT = 2.0  # Seconds a render may take before the post is shown as plain text
+MARKDOWN_RENDER_POOL_START_TIMEOUT = 30.0  # Seconds to wait for a new pool's processes to start before rendering anyway
+MARKDOWN_FALLBACK_CACHE_TIMEOUT = 60 * 5  # Seconds a timed-out post is shown as plain text before retrying
+MARKDOWN_SLOW_RENDER = 0.5  # Seconds after which a render is logged as slow
+
+# Reverse Proxy Purging
+PURGE_ENDPOINT = None  # URL of the proxy's purge endpoint, e.g. 'http://127.0.0.1:6081/'; None disables purging
+PURGE_METHOD = 'PURGE'  # HTTP method of purge requests
+PURGE_HEADERS = {}  # Extra headers sent with purge requests, e.g. an API token
+PURGE_BATCH_SIZE = 100  # Surrogate keys sent per purge request
+PURGE_TIMEOUT = 5  # Seconds to wait for the proxy to answer a purge request
+PURGE_SURROGATE_CONTROL = None  # Optional Surrogate-Control header for blog pages, e.g. 'max-age=3600'
+
+# Post Outline Configuration
+READING_WORDS_PER_MINUTE = 200  # Reading speed used for the "N min read" label
+TOC_MAX_LEVEL = 4  # Deepest heading level listed in a post's table of contents
+TOC_MIN_HEADINGS = 3  # Headings a post needs before its table of contents is shown
+EXCERPT_WORDS = 50  # Words of a post shown on the home, category and archive pages
+POST_INDEX_CHECK_INTERVAL = 1  # Seconds between checks whether another process changed the listed posts
+
+# Background Job Configuration
+JOBS_ASYNC = None  # True queues side effects for run_jobs, False runs them after commit, None = not DEBUG
+JOB_BATCH_SIZE = 50  # Jobs of one task handed to its handler at once
+JOB_MAX_ATTEMPTS = 5  # Attempts before a job is marked as failed
+JOB_RETRY_DELAY = 30  # Seconds before the first retry, doubled after each failure
+JOB_TIMEOUT = 60 * 10  # Seconds before a job claimed by a vanished worker is requeued
+
+# Preload Hint Configuration
+PRELOAD_ASSETS = [  # Static files announced with Link: rel=preload on every page
+    ('css/style.css', 'style'),
+    ('js/main.js', 'script'),
+]
+PRELOAD_PRECONNECT = [  # Origins the browser should connect to early, and whether to connect with CORS
+    ('https://fonts.googleapis.com', False),
+    ('https://fonts.gstatic.com', True),
+]
+PRELOAD_EXCLUDE_PREFIXES = ('/admin/', '/api/', '/mdeditor/')  # Paths that never get preload hints or 103 Early Hints
+
+# Editor Upload Configuration
+UPLOAD_CHUNK_SIZE = 64 * 1024  # Bytes of an uploaded image written and hashed at a time
+UPLOAD_CACHE_MAX_AGE = 60 * 60 * 24 * 365  # Seconds browsers may cache content-addressed uploads served under DEBUG
@@ -15,17 +15,23 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from blog import uploads
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('blog.urls', namespace='blog')),
+    # Content-addressed editor uploads, replacing mdeditor's own upload view
+    path('mdeditor/uploads/', uploads.upload_image, name='uploads'),
     path('mdeditor/', include('mdeditor.urls')),
 ]
 
-# Add static and media URLs in debug mode
+# Add static and media URLs in debug mode; in production the web server
+# serves them, including the immutable Cache-Control header of uploads
 if settings.DEBUG:
+    urlpatterns.append(re_path(uploads.UPLOAD_URL_PATTERN, uploads.serve_upload, name='upload'))
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+Startup Benchmark - Measures worker boot cost
+=============================================
+Imports ``C0D3_V1B3.wsgi`` and ``C0D3_V1B3.asgi`` in fresh interpreter
+processes and reports how long creating the application and loading the
+URLconf and template libraries takes, how much resident memory the process
+ends up using, and whether any of the heavy rendering and editor modules were
+imported along the way.
+
+Each run also measures a reference process that only sets Django up
+(``django.setup()`` with the project settings). Import times are compared as
+a ratio to that reference, so a baseline stays meaningful on a machine that is
+uniformly faster or slower. Baselines are machine-specific and are kept in
+``startup_results.json``, which is not committed: record one on your machine
+before making a change, then compare after it.
+
+Usage:
+    python benchmarks/startup.py                 # print results
+    python benchmarks/startup.py --save          # record results as the local baseline
+    python benchmarks/startup.py --compare       # fail if slower than the local baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_FILE = Path(__file__).resolve().parent / 'startup_results.json'
+
+# Same-run reference: the cost of Django itself, without the project's application
+REFERENCE_MODULE = 'django'
+
+# Modules that should only be imported on first render or in the admin
+HEAVY_MODULES = ('markdown', 'bleach', 'pygments', 'markdownify')
+
+PROBE = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+import importlib
+module = importlib.import_module(sys.argv[1])
+if sys.argv[1] == 'django':
+    module.setup()
+else:
+    module.application
+    # URLconf and template libraries load lazily on the first request, which
+    # a worker pays for before serving anything
+    from django.template import engines
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    engines['django'].engine.template_libraries
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss_kb //= 1024
+heavy = sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[2].split(',')))
+print(json.dumps({'seconds': elapsed, 'rss_kb': rss_kb, 'heavy_modules': heavy}))
+'''
+
+def probe(module):
+    """
+    Imports a module in a fresh process.
+
+    For an application module, the URLconf and template libraries are loaded
+    as part of the timed import, as they would be on the first request.
+
+    Args:
+        module: Dotted path of the module exposing ``application``, or
+            ``REFERENCE_MODULE`` to only set Django up
+
+    Returns:
+        dict: Import time, peak RSS and heavy modules loaded
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='C0D3_V1B3.settings')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, module, ','.join(HEAVY_MODULES)],
+        cwd=BASE_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure(modules, runs):
+    """
+    Imports each module in ``runs`` fresh processes and summarizes the results.
+
+    The modules take turns, so load on the machine affects all of them alike
+    and their ratios stay comparable. One untimed round warms the file cache.
+
+    Args:
+        modules: Dotted module paths, see ``probe()``
+        runs: Number of processes to start per module
+
+    Returns:
+        dict: Per module, the fastest import time, median peak RSS and heavy
+        modules loaded
+    """
+    for module in modules:
+        probe(module)
+    samples = {module: [] for module in modules}
+    for _ in range(runs):
+        for module in modules:
+            samples[module].append(probe(module))
+    return {
+        module: {
+            'seconds': min(sample['seconds'] for sample in results),
+            'rss_kb': statistics.median(sample['rss_kb'] for sample in results),
+            'heavy_modules': results[-1]['heavy_modules'],
+        }
+        for module, results in samples.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=7, help='Fresh processes per application')
+    parser.add_argument('--save', action='store_true', help='Store results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='Compare against the stored baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before failing (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = measure((REFERENCE_MODULE, 'C0D3_V1B3.wsgi', 'C0D3_V1B3.asgi'), args.runs)
+    reference = results.pop(REFERENCE_MODULE)
+    for result in results.values():
+        result['relative'] = result['seconds'] / reference['seconds'] if reference['seconds'] else 1.0
+    failed = False
+    baseline = json.loads(RESULTS_FILE.read_text()) if args.compare and RESULTS_FILE.exists() else {}
+    if args.compare and not baseline:
+        print('No local baseline in %s, run with --save first' % RESULTS_FILE.relative_to(BASE_DIR))
+
+    print('%-16s %8.1f ms  %8.1f MB RSS  (reference)' % (
+        'django.setup()', reference['seconds'] * 1000, reference['rss_kb'] / 1024
+    ))
+    for module, result in results.items():
+        line = '%-16s %8.1f ms  %8.1f MB RSS  %5.2fx reference' % (
+            module, result['seconds'] * 1000, result['rss_kb'] / 1024, result['relative']
+        )
+        if result['heavy_modules']:
+            line += '  heavy imports: %s' % ', '.join(result['heavy_modules'])
+            failed = True
+        if 'relative' in baseline.get(module, {}):
+            ratio = result['relative'] / baseline[module]['relative']
+            line += '  (%+.0f%% vs baseline)' % ((ratio - 1) * 100)
+            if ratio > 1 + args.tolerance:
+                failed = True
+        print(line)
+
+    if args.save:
+        RESULTS_FILE.write_text(json.dumps(results, indent=2) + '\n')
+        print('Saved baseline to %s' % RESULTS_FILE.relative_to(BASE_DIR))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
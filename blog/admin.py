@@ -6,7 +6,11 @@ It registers models and customizes their presentation and functionality in the a
 """
 
 from django.contrib import admin
-from .models import Category, Post, Comment
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import Category, Post, Comment, Job
+from . import caching, postindex, purge
+from .tasks import queue_post_changed
 
 class CategoryAdmin(admin.ModelAdmin):
     """
@@ -45,26 +49,42 @@ class PostAdmin(admin.ModelAdmin):
     - Auto-populated slug from title
     - Custom action to publish posts
     - Inline display of comments
+    - Render time of each post, to spot posts that are slow to render
     """
-    list_display = ('title', 'author', 'status', 'created_on')
+    list_display = ('title', 'author', 'status', 'created_on', 'render_time')
     list_filter = ('status', 'categories', 'created_on')
     search_fields = ['title', 'content']
     prepopulated_fields = {'slug': ('title',)}
     actions = ['make_published']
     inlines = [CommentInline]
-    readonly_fields = ('created_on', 'updated_on')
+    readonly_fields = ('created_on', 'updated_on', 'word_count', 'render_time')
     
     def make_published(self, request, queryset):
         """
         Custom admin action to mark selected posts as published.
         
         Changes the status of selected posts to '1' (Published).
+        Bulk updates skip model signals, so the cached archive list and the
+        post index are refreshed, the posts' background work is queued and
+        the affected pages are purged here. The posts are read before the
+        update, since a status filter on the changelist would no longer
+        match them afterwards.
         
         Args:
             request: The current request
             queryset: The selected posts
         """
+        posts = list(queryset.prefetch_related('categories'))
         queryset.update(status=1)
+        caching.invalidate(caching.ARCHIVES_CACHE_KEY)
+        postindex.invalidate()
+        keys = [purge.SIDEBAR_KEY, purge.POST_LIST_KEY]
+        for post in posts:
+            queue_post_changed(post.pk)
+            keys.append(purge.post_key(post.pk))
+            keys += purge.archive_keys(post.created_on)
+            keys += [purge.category_key(category.slug) for category in post.categories.all()]
+        purge.purge(keys)
     make_published.short_description = "Mark selected posts as published"
 
 class CommentAdmin(admin.ModelAdmin):
@@ -87,15 +107,57 @@ class CommentAdmin(admin.ModelAdmin):
         Custom admin action to approve selected comments.
         
         Changes the 'approved' status of selected comments to True.
+        Bulk updates skip model signals, so the posts' pages are purged here.
         
         Args:
             request: The current request
             queryset: The selected comments
         """
+        post_ids = set(queryset.values_list('post_id', flat=True))
         queryset.update(approved=True)
+        purge.purge(purge.post_key(post_id) for post_id in post_ids)
     approve_comments.short_description = "Approve selected comments"
 
+class JobAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the Job model.
+    
+    Features:
+    - List display with task, key, status and retry information
+    - Filtering by task name and status
+    - Custom action to retry failed jobs
+    """
+    list_display = ('name', 'key', 'status', 'attempts', 'run_after', 'created_on')
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+    readonly_fields = ('claimed_by', 'claimed_on', 'last_error', 'created_on')
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        """
+        Custom admin action to queue selected failed jobs again.
+        
+        Resets the attempt counter so failed jobs get the full number of retries.
+        A job whose name and key are already queued is deleted instead, since
+        the queued copy does the same work. Queued and running jobs are left
+        alone.
+        
+        Args:
+            request: The current request
+            queryset: The selected jobs
+        """
+        for job in queryset.filter(status=Job.FAILED):
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk).update(
+                        status=Job.QUEUED, attempts=0, claimed_by='', run_after=timezone.now()
+                    )
+            except IntegrityError:
+                job.delete()
+    retry_jobs.short_description = "Retry selected jobs"
+
 # Register models with the admin site using their custom admin classes
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,305 @@
+"""
+Blog API - Read-only JSON endpoints for the blog application
+=============================================
+This module exposes posts, categories, archives and approved comments as JSON
+for external frontends and mobile apps.
+
+Responses are serialized straight from ``values()`` rows rather than model
+instances. Lists use cursor (keyset) pagination so deep pages cost the same as
+the first one, clients can ask for a subset of fields with ``?fields=``, and
+every response carries an ETag so unchanged data is answered with a 304.
+"""
+
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.http import HttpResponse, HttpResponseNotModified, Http404
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from .cursors import encode_cursor, decode_cursor
+from .models import Post, Category, Comment
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+# Fields a client may request, mapped to the ORM lookups they are read from
+POST_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'author': 'author__username',
+    'created_on': 'created_on',
+    'updated_on': 'updated_on',
+    'content': 'content',
+    'word_count': 'word_count',
+    'reading_time': 'reading_time',
+    'toc': 'toc',
+}
+# Fields computed after the query rather than selected directly
+POST_EXTRA_FIELDS = ('url', 'categories')
+POST_LIST_DEFAULT_FIELDS = ('id', 'slug', 'title', 'author', 'created_on', 'updated_on', 'url', 'categories')
+POST_DETAIL_DEFAULT_FIELDS = POST_LIST_DEFAULT_FIELDS + ('content',)
+COMMENT_FIELDS = ('id', 'name', 'content', 'created_on')
+
+def json_response(request, data):
+    """
+    Serializes data to compact JSON and handles conditional requests.
+
+    The ETag is a hash of the serialized body, so a client sending it back in
+    ``If-None-Match`` gets an empty 304 when nothing changed.
+
+    Args:
+        request: HTTP request
+        data: JSON-serializable data
+
+    Returns:
+        HttpResponse: JSON response or 304 Not Modified
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+def bad_request(message):
+    """
+    Returns a JSON error response for invalid query parameters.
+
+    Args:
+        message: Human readable error message
+
+    Returns:
+        HttpResponse: JSON response with status 400
+    """
+    return HttpResponse(json.dumps({'error': message}), content_type='application/json', status=400)
+
+def parse_fields(request, defaults, allowed):
+    """
+    Reads the sparse field selection from ``?fields=a,b,c``.
+
+    Args:
+        request: HTTP request
+        defaults: Fields returned when no selection is given
+        allowed: Every field the endpoint can return
+
+    Returns:
+        list: Selected field names
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(defaults)
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError('Unknown fields: %s' % ', '.join(unknown))
+    return fields
+
+def parse_limit(request):
+    """
+    Reads the page size from ``?limit=``, clamped to ``MAX_PAGE_SIZE``.
+
+    Args:
+        request: HTTP request
+
+    Returns:
+        int: Number of rows to return
+
+    Raises:
+        ValueError: If the limit is not a positive integer
+    """
+    limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+def paginate(request, queryset, descending=True):
+    """
+    Applies keyset pagination on ``(created_on, id)`` to a values queryset.
+
+    Args:
+        request: HTTP request with optional ``cursor`` and ``limit`` parameters
+        queryset: Queryset that selects at least ``id`` and ``created_on``
+        descending: Whether rows are returned newest first
+
+    Returns:
+        tuple: List of rows for the page and the cursor for the next page (or None)
+    """
+    limit = parse_limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        created_on, pk = decode_cursor(cursor)
+        if descending:
+            queryset = queryset.filter(Q(created_on__lt=created_on) | Q(created_on=created_on, id__lt=pk))
+        else:
+            queryset = queryset.filter(Q(created_on__gt=created_on) | Q(created_on=created_on, id__gt=pk))
+    order = ('-created_on', '-id') if descending else ('created_on', 'id')
+    rows = list(queryset.order_by(*order)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_on'], rows[-1]['id'])
+    return rows, next_cursor
+
+def serialize_posts(rows, fields):
+    """
+    Shapes post rows into API objects with only the selected fields.
+
+    Category slugs for all rows are fetched with a single query.
+
+    Args:
+        rows: Rows from ``Post.objects.values()``
+        fields: Selected field names
+
+    Returns:
+        list: Dictionaries ready for JSON serialization
+    """
+    categories = {}
+    if 'categories' in fields and rows:
+        links = Post.categories.through.objects.filter(
+            post_id__in=[row['id'] for row in rows]
+        ).values_list('post_id', 'category__slug')
+        for post_id, slug in links:
+            categories.setdefault(post_id, []).append(slug)
+    items = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field == 'url':
+                item['url'] = reverse('blog:post_detail', args=[row['slug']])
+            elif field == 'categories':
+                item['categories'] = categories.get(row['id'], [])
+            else:
+                item[field] = row[POST_FIELDS[field]]
+        items.append(item)
+    return items
+
+def post_values(fields):
+    """
+    Returns a values queryset of published posts selecting what ``fields`` need.
+
+    Args:
+        fields: Selected field names
+
+    Returns:
+        QuerySet: Published posts as dictionaries
+    """
+    lookups = {'id', 'created_on'}
+    lookups.update(POST_FIELDS[field] for field in fields if field in POST_FIELDS)
+    if 'url' in fields:
+        lookups.add('slug')
+    return Post.objects.filter(status=1).values(*lookups)
+
+@require_GET
+def post_list(request):
+    """
+    API view listing published posts, newest first.
+
+    Args:
+        request: HTTP request
+
+    Returns:
+        HttpResponse: JSON with ``results`` and ``next`` cursor
+    """
+    try:
+        fields = parse_fields(request, POST_LIST_DEFAULT_FIELDS, tuple(POST_FIELDS) + POST_EXTRA_FIELDS)
+        queryset = post_values(fields)
+        category = request.GET.get('category')
+        if category:
+            queryset = queryset.filter(categories__slug=category)
+        rows, next_cursor = paginate(request, queryset)
+    except ValueError as exc:
+        return bad_request(str(exc))
+    return json_response(request, {'results': serialize_posts(rows, fields), 'next': next_cursor})
+
+@require_GET
+def post_detail(request, slug):
+    """
+    API view for a single published post.
+
+    Args:
+        request: HTTP request
+        slug: Post slug from URL
+
+    Returns:
+        HttpResponse: JSON object for the post
+    """
+    try:
+        fields = parse_fields(request, POST_DETAIL_DEFAULT_FIELDS, tuple(POST_FIELDS) + POST_EXTRA_FIELDS)
+    except ValueError as exc:
+        return bad_request(str(exc))
+    rows = list(post_values(fields).filter(slug=slug)[:1])
+    if not rows:
+        raise Http404("Post not found")
+    return json_response(request, serialize_posts(rows, fields)[0])
+
+@require_GET
+def category_list(request):
+    """
+    API view listing categories with their published post counts.
+
+    Args:
+        request: HTTP request
+
+    Returns:
+        HttpResponse: JSON with ``results``
+    """
+    rows = Category.objects.order_by('name').values('id', 'name', 'slug').annotate(
+        post_count=Count('posts', filter=Q(posts__status=1))
+    )
+    return json_response(request, {'results': list(rows)})
+
+@require_GET
+def archive_list(request):
+    """
+    API view listing months with published posts and how many were published.
+
+    Args:
+        request: HTTP request
+
+    Returns:
+        HttpResponse: JSON with ``results``
+    """
+    rows = (
+        Post.objects.filter(status=1)
+        .annotate(month=TruncMonth('created_on'))
+        .values('month')
+        .annotate(post_count=Count('id'))
+        .order_by('-month')
+    )
+    results = [
+        {'year': row['month'].year, 'month': row['month'].month, 'post_count': row['post_count']}
+        for row in rows
+    ]
+    return json_response(request, {'results': results})
+
+@require_GET
+def comment_list(request, slug):
+    """
+    API view listing approved comments on a published post, oldest first.
+
+    Args:
+        request: HTTP request
+        slug: Post slug from URL
+
+    Returns:
+        HttpResponse: JSON with ``results`` and ``next`` cursor
+    """
+    post_id = Post.objects.filter(status=1, slug=slug).values_list('id', flat=True).first()
+    if post_id is None:
+        raise Http404("Post not found")
+    queryset = Comment.objects.filter(post_id=post_id, approved=True).values(*COMMENT_FIELDS)
+    try:
+        rows, next_cursor = paginate(request, queryset, descending=False)
+    except ValueError as exc:
+        return bad_request(str(exc))
+    return json_response(request, {'results': rows, 'next': next_cursor})
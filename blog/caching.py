@@ -0,0 +1,182 @@
+"""
+Blog Caching - Single-flight cache with stale-while-revalidate
+=============================================
+This module provides ``get_or_compute()``, the helper the blog uses for its
+expensive computations (Markdown rendering, sidebar data, page fragments).
+
+Compared to a plain ``cache.get()``/``cache.set()`` it adds:
+- A small per-process LRU in front of the shared cache, so hot keys are
+  served without a cache round trip
+- Stale-while-revalidate: values are kept for ``stale_timeout`` seconds after
+  they expire. When an expired value is requested, one caller recomputes it
+  while everybody else keeps getting the stale value
+- Single flight: a lock key taken with ``cache.add()`` makes sure only one
+  worker recomputes a key at a time, so an expiry does not turn into a
+  stampede of identical queries
+- Stale fallback: if recomputing fails (for example because SQLite reports
+  "database is locked"), the stale value is served instead of an error
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOCAL_MAX_ENTRIES = getattr(settings, 'CACHE_LOCAL_MAX_ENTRIES', 1000)
+CACHE_LOCAL_TIMEOUT = getattr(settings, 'CACHE_LOCAL_TIMEOUT', 5)
+CACHE_STALE_TIMEOUT = getattr(settings, 'CACHE_STALE_TIMEOUT', 60 * 60)
+CACHE_LOCK_TIMEOUT = getattr(settings, 'CACHE_LOCK_TIMEOUT', 30)
+CACHE_LOCK_WAIT = getattr(settings, 'CACHE_LOCK_WAIT', 2)
+SIDEBAR_CACHE_TIMEOUT = getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 60 * 10)
+
+# Keys for the sidebar data shared by every page, invalidated by blog.signals
+ARCHIVES_CACHE_KEY = 'sidebar:archives'
+CATEGORIES_CACHE_KEY = 'sidebar:categories'
+
+class LocalLRU:
+    """
+    Thread-safe, size-bounded map of cache keys to ``(value, fresh_until, local_until)``.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the entry for a key and marks it as recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            tuple or None: ``(value, fresh_until, local_until)``
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        """
+        Stores an entry, evicting the least recently used one when full.
+
+        Args:
+            key: Cache key
+            entry: ``(value, fresh_until, local_until)``
+        """
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Removes a key if present.
+
+        Args:
+            key: Cache key
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        with self.lock:
+            self.entries.clear()
+
+local_cache = LocalLRU(CACHE_LOCAL_MAX_ENTRIES)
+
+def remember(key, value, fresh_until, timeout, stale_timeout):
+    """
+    Stores a value in the shared cache and the local LRU.
+
+    Args:
+        key: Cache key
+        value: Value to store
+        fresh_until: Timestamp after which the value is stale
+        timeout: Seconds the value is fresh, or None to never expire
+        stale_timeout: Extra seconds the value is kept for stale reads
+    """
+    shared_timeout = None if timeout is None else timeout + stale_timeout
+    cache.set(key, (value, fresh_until), shared_timeout)
+    local_cache.set(key, (value, fresh_until, time.time() + CACHE_LOCAL_TIMEOUT))
+
+def get_or_compute(key, compute, timeout=300, stale_timeout=CACHE_STALE_TIMEOUT):
+    """
+    Returns a cached value, computing it at most once across workers.
+
+    Args:
+        key: Cache key
+        compute: Zero-argument callable producing the value
+        timeout: Seconds the value is fresh, or None to keep it until invalidated
+        stale_timeout: Seconds an expired value may still be served while it
+            is being recomputed or when recomputing fails
+
+    Returns:
+        The cached or freshly computed value
+    """
+    now = time.time()
+    entry = local_cache.get(key)
+    if entry is not None and now < entry[2] and (entry[1] is None or now < entry[1]):
+        return entry[0]
+
+    stored = cache.get(key)
+    if stored is not None:
+        value, fresh_until = stored
+        if fresh_until is None or now < fresh_until:
+            local_cache.set(key, (value, fresh_until, now + CACHE_LOCAL_TIMEOUT))
+            return value
+
+    lock_key = '%s:lock' % key
+    if not cache.add(lock_key, True, CACHE_LOCK_TIMEOUT):
+        if stored is not None:
+            # Someone else is recomputing; serve the stale value meanwhile
+            return stored[0]
+        # Nothing to fall back on: wait briefly for the other worker's result
+        deadline = time.time() + CACHE_LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(0.05)
+            stored = cache.get(key)
+            if stored is not None:
+                return stored[0]
+        return compute()
+
+    try:
+        value = compute()
+    except Exception:
+        if stored is None:
+            raise
+        logger.warning('Serving stale value for %s after recompute failed', key, exc_info=True)
+        return stored[0]
+    finally:
+        cache.delete(lock_key)
+
+    fresh_until = None if timeout is None else time.time() + timeout
+    remember(key, value, fresh_until, timeout, stale_timeout)
+    return value
+
+def invalidate(key, stale_timeout=CACHE_STALE_TIMEOUT):
+    """
+    Marks a cached value as expired while keeping it for stale reads.
+
+    The next request recomputes the value; concurrent requests get the old
+    one until that finishes.
+
+    Args:
+        key: Cache key
+        stale_timeout: Seconds the old value may still be served
+    """
+    local_cache.delete(key)
+    stored = cache.get(key)
+    if stored is not None:
+        cache.set(key, (stored[0], 0), stale_timeout)
@@ -0,0 +1,132 @@
+"""
+Blog Comments - Comment submission and pagination
+=============================================
+This module contains the comment logic shared by the function-based and
+class-based post detail views: paging through approved comments and handling
+new submissions.
+
+Approved comments are paged with keyset pagination on ``(created_on, id)``.
+The post page renders only the first batch; further batches are fetched from
+the comment fragment endpoint by ``main.js``, so the size of the initial
+response does not depend on how long the discussion is.
+
+Submissions go through a series of cheap checks, ordered so that junk is
+rejected before it reaches the database:
+1. Honeypot field - bots that fill the hidden ``website`` input are dropped
+2. Required fields
+3. Per-IP and per-post rate limits (token buckets, see ``blog.ratelimit``);
+   a submission rejected by either limit consumes no token from the other
+4. Duplicate detection by hashing the post id, the commenter's email and
+   the normalized comment text, so a short reply such as "Thanks!" from
+   different people is not mistaken for a repost
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Q
+
+from .cursors import encode_cursor, decode_cursor
+from .models import Comment
+from .ratelimit import RateLimiter, allow_all, get_client_ip
+
+HONEYPOT_FIELD = 'website'
+COMMENT_RATE_LIMITS = getattr(settings, 'COMMENT_RATE_LIMITS', {'ip': (5, 300), 'post': (30, 300)})
+COMMENT_DUPLICATE_WINDOW = getattr(settings, 'COMMENT_DUPLICATE_WINDOW', 60 * 60 * 24)
+COMMENT_TRUST_X_FORWARDED_FOR = getattr(settings, 'COMMENT_TRUST_X_FORWARDED_FOR', False)
+COMMENTS_PAGE_SIZE = getattr(settings, 'COMMENTS_PAGE_SIZE', 20)
+
+ip_limiter = RateLimiter('comment-ip', *COMMENT_RATE_LIMITS['ip'])
+post_limiter = RateLimiter('comment-post', *COMMENT_RATE_LIMITS['post'])
+
+def get_comment_page(post_id, after=None, limit=COMMENTS_PAGE_SIZE):
+    """
+    Returns one batch of approved comments for a post, oldest first.
+
+    Args:
+        post_id: Primary key of the post
+        after: Cursor returned with the previous batch, or None for the first one
+        limit: Number of comments per batch
+
+    Returns:
+        tuple: List of comments and the cursor for the next batch (or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    queryset = Comment.objects.filter(post_id=post_id, approved=True)
+    if after:
+        created_on, pk = decode_cursor(after)
+        queryset = queryset.filter(Q(created_on__gt=created_on) | Q(created_on=created_on, id__gt=pk))
+    comments = list(
+        queryset.only('id', 'name', 'content', 'created_on').order_by('created_on', 'id')[:limit + 1]
+    )
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor(comments[-1].created_on, comments[-1].pk)
+    return comments, next_cursor
+
+def content_hash(post, email, content):
+    """
+    Hashes a comment's author and text for duplicate detection.
+
+    Whitespace and case are normalized so trivial variations still match.
+
+    Args:
+        post: The post being commented on
+        email: Commenter's email address
+        content: Comment text
+
+    Returns:
+        str: Hex digest identifying the comment
+    """
+    normalized = ' '.join(content.lower().split())
+    return hashlib.sha256(('%s:%s:%s' % (post.pk, email.strip().lower(), normalized)).encode()).hexdigest()
+
+def submit_comment(request, post):
+    """
+    Validates a comment submission and stores it for moderation.
+
+    Adds a success or error message for the user in every case. Honeypot
+    submissions get the normal success message so bots learn nothing.
+
+    Args:
+        request: HTTP POST request with name, email and content fields
+        post: The post being commented on
+
+    Returns:
+        bool: True if a comment was created
+    """
+    success = 'Your comment has been submitted and is awaiting approval.'
+    if request.POST.get(HONEYPOT_FIELD):
+        messages.success(request, success)
+        return False
+
+    name = request.POST.get('name')
+    email = request.POST.get('email')
+    content = request.POST.get('content')
+    if not (name and email and content):
+        messages.error(request, 'Please fill in all the required fields.')
+        return False
+
+    ip = get_client_ip(request, COMMENT_TRUST_X_FORWARDED_FOR)
+    if not allow_all((ip_limiter, ip), (post_limiter, post.pk)):
+        messages.error(request, 'Too many comments were submitted recently. Please try again later.')
+        return False
+
+    # cache.add only succeeds for a hash not seen within the window
+    if not cache.add('comment-hash:%s' % content_hash(post, email, content), True, COMMENT_DUPLICATE_WINDOW):
+        messages.error(request, 'This comment has already been submitted.')
+        return False
+
+    Comment.objects.create(
+        post=post,
+        name=name,
+        email=email,
+        content=content
+    )
+    messages.success(request, success)
+    return True
@@ -0,0 +1,50 @@
+"""
+Blog Cursors - Opaque keyset pagination cursors
+=============================================
+Lists ordered by ``(created_on, id)`` (API posts and comments, comment batches
+below a post) are paged with keyset pagination: the next page starts just
+past the last row of the previous one. This module turns that position into
+an opaque, URL-safe string and back, so the JSON API and the comment
+fragment endpoint share one cursor format.
+"""
+
+import base64
+
+from django.utils.dateparse import parse_datetime
+
+def encode_cursor(created_on, pk):
+    """
+    Builds an opaque cursor pointing just past the given row.
+
+    Args:
+        created_on: Creation datetime of the last row on the page
+        pk: Primary key of the last row on the page
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = '%s|%s' % (created_on.isoformat(), pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by ``encode_cursor``.
+
+    Args:
+        cursor: Cursor string from a request parameter
+
+    Returns:
+        tuple: Creation datetime and primary key of the last row seen
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_on, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_on = parse_datetime(created_on)
+        pk = int(pk)
+    except Exception as exc:
+        raise ValueError('Invalid cursor') from exc
+    if created_on is None:
+        raise ValueError('Invalid cursor')
+    return created_on, pk
@@ -0,0 +1,139 @@
+"""
+Blog Front Matter - Reading and writing Markdown files with metadata
+=============================================
+This module converts between Markdown files that start with a simple
+``key: value`` front matter block and plain dictionaries, for use by the
+``import_markdown`` and ``export_markdown`` management commands.
+
+Only the small subset of YAML needed for posts is supported: scalar values
+and inline lists such as ``categories: [python, django]``. Values containing
+special characters are written in double quotes, with ``"`` and ``\\``
+escaped by a backslash, so they read back unchanged.
+"""
+
+import re
+
+DELIMITER = '---'
+
+def parse_value(raw):
+    """
+    Converts a raw front matter value into a string or list of strings.
+
+    Args:
+        raw: Text after the colon of a front matter line
+
+    Returns:
+        str or list: Unquoted scalar, or list for ``[a, b]`` values
+    """
+    raw = raw.strip()
+    if raw.startswith('[') and raw.endswith(']'):
+        return [unquote(item) for item in split_items(raw[1:-1]) if item.strip()]
+    return unquote(raw)
+
+def split_items(raw):
+    """
+    Splits the inside of an inline list on commas outside double quotes.
+
+    Args:
+        raw: Text between the brackets
+
+    Returns:
+        list: Raw item texts, still quoted
+    """
+    items = []
+    current = []
+    quoted = escaped = False
+    for char in raw:
+        if escaped:
+            escaped = False
+        elif char == '\\' and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            items.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    items.append(''.join(current))
+    return items
+
+def unquote(value):
+    """
+    Strips surrounding whitespace and matching quotes from a value.
+
+    Backslash escapes are resolved inside double quotes.
+
+    Args:
+        value: Raw scalar text
+
+    Returns:
+        str: Unquoted value
+    """
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', value[1:-1])
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1]
+    return value
+
+def parse(text):
+    """
+    Splits a Markdown document into front matter and body.
+
+    Args:
+        text: Full file contents
+
+    Returns:
+        tuple: Dictionary of metadata and the Markdown body
+    """
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != DELIMITER:
+        return {}, text
+    meta = {}
+    for index, line in enumerate(lines[1:], start=1):
+        if line.strip() == DELIMITER:
+            body = '\n'.join(lines[index + 1:]).lstrip('\n')
+            return meta, body
+        if ':' in line:
+            key, value = line.split(':', 1)
+            meta[key.strip().lower()] = parse_value(value)
+    # No closing delimiter, so treat the whole file as content
+    return {}, text
+
+def quote(value):
+    """
+    Quotes a scalar when it would otherwise be read back differently.
+
+    Args:
+        value: Scalar value to write
+
+    Returns:
+        str: Value safe to place after ``key:``
+    """
+    value = str(value)
+    if value != value.strip() or any(char in value for char in ':[],"\'#\\'):
+        return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+    return value
+
+def dump(meta, body):
+    """
+    Builds a Markdown document with a front matter block.
+
+    Args:
+        meta: Dictionary of metadata; list values are written inline
+        body: Markdown content
+
+    Returns:
+        str: Full file contents
+    """
+    lines = [DELIMITER]
+    for key, value in meta.items():
+        if isinstance(value, (list, tuple)):
+            value = '[%s]' % ', '.join(quote(item) for item in value)
+        else:
+            value = quote(value)
+        lines.append('%s: %s' % (key, value))
+    lines.append(DELIMITER)
+    lines.append('')
+    return '\n'.join(lines) + '\n' + body.rstrip('\n') + '\n'
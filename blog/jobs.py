@@ -0,0 +1,222 @@
+"""
+Blog Jobs - Database-backed background job queue
+=============================================
+This module moves slow side effects of saving content (rendering, the
+related-posts index, reverse-proxy purges, ...) out of the request that made
+the change. Handlers are registered with ``@task`` (see ``blog.tasks``) and
+run by ``python manage.py run_jobs``; no external broker is needed.
+
+How jobs flow:
+- ``enqueue()`` inserts a ``Job`` row inside the caller's transaction, so a
+  rolled-back change never runs its side effects
+- A queued job with the same name and key is not queued twice, so saving a
+  post five times in a row renders it once; a conditional unique constraint
+  on ``Job`` guarantees this even when two processes enqueue at once
+- The worker claims up to ``JOB_BATCH_SIZE`` queued jobs of one task at a
+  time and passes all their payloads to the handler in a single call
+- A failed batch is retried with exponential backoff; after
+  ``JOB_MAX_ATTEMPTS`` attempts its jobs are marked Failed
+- Jobs claimed by a worker that died are requeued after ``JOB_TIMEOUT``
+
+With ``JOBS_ASYNC = False`` handlers run right after the transaction commits
+instead. When ``JOBS_ASYNC`` is not set (or None) this is the default while
+``DEBUG`` is on, so a plain ``runserver`` shows rendered posts, excerpts and
+related posts without a worker running.
+"""
+
+import datetime
+import logging
+import traceback
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_BATCH_SIZE = getattr(settings, 'JOB_BATCH_SIZE', 50)
+JOB_MAX_ATTEMPTS = getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+JOB_RETRY_DELAY = getattr(settings, 'JOB_RETRY_DELAY', 30)
+JOB_TIMEOUT = getattr(settings, 'JOB_TIMEOUT', 60 * 10)
+
+TASKS = {}
+
+def task(name):
+    """
+    Registers a function as the handler for a job name.
+
+    Handlers receive a list with the payloads of every job in the batch and
+    must be safe to run more than once for the same payload.
+
+    Args:
+        name: Job name used with ``enqueue()``
+
+    Returns:
+        function: Decorator registering the handler
+    """
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+def jobs_async():
+    """
+    Says whether jobs are queued for the worker or run right after commit.
+
+    Returns:
+        bool: ``JOBS_ASYNC``, or ``not DEBUG`` if it is unset or None
+    """
+    value = getattr(settings, 'JOBS_ASYNC', None)
+    return not settings.DEBUG if value is None else value
+
+def enqueue(name, key='', payload=None):
+    """
+    Queues a job to run after the current transaction commits.
+
+    Args:
+        name: Name of a registered task
+        key: Deduplication key; a queued job with the same name and key
+            makes this call a no-op. Empty keys are never deduplicated
+        payload: JSON-serializable dict passed to the handler
+    """
+    payload = payload or {}
+    if not jobs_async():
+        transaction.on_commit(lambda: run_task(name, [payload]))
+        return
+    if not key:
+        Job.objects.create(name=name, key=key, payload=payload)
+        return
+    if Job.objects.filter(name=name, key=key, status=Job.QUEUED).exists():
+        return
+    try:
+        with transaction.atomic():
+            Job.objects.create(name=name, key=key, payload=payload)
+    except IntegrityError:
+        # Another process queued the same job since the check above
+        pass
+
+def run_task(name, payloads):
+    """
+    Calls the handler registered for a job name.
+
+    Args:
+        name: Task name
+        payloads: List of job payloads
+
+    Raises:
+        KeyError: If no handler is registered under ``name``
+    """
+    TASKS[name](payloads)
+
+def claim(worker, batch_size=JOB_BATCH_SIZE):
+    """
+    Takes a batch of due jobs of a single task for one worker.
+
+    Claiming is a conditional UPDATE tagged with the worker id, so it works
+    on SQLite (which has no ``SELECT ... FOR UPDATE``) and two workers never
+    run the same job.
+
+    Args:
+        worker: Unique id of the calling worker
+        batch_size: Maximum number of jobs to claim
+
+    Returns:
+        list: Claimed jobs, all with the same name (empty if nothing is due)
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, claimed_on__lt=now - datetime.timedelta(seconds=JOB_TIMEOUT))
+    # A stale job whose key was queued again meanwhile is covered by that job
+    stale.filter(
+        Exists(Job.objects.filter(name=OuterRef('name'), key=OuterRef('key'), status=Job.QUEUED)), key__gt=''
+    ).delete()
+    # Of stale jobs sharing a key, only the oldest is queued again
+    stale.filter(
+        Exists(stale.filter(name=OuterRef('name'), key=OuterRef('key'), pk__lt=OuterRef('pk'))), key__gt=''
+    ).delete()
+    stale.update(status=Job.QUEUED, claimed_by='')
+
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+    name = due.values_list('name', flat=True).first()
+    if name is None:
+        return []
+    ids = list(due.filter(name=name).values_list('id', flat=True)[:batch_size])
+    Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+        status=Job.RUNNING, claimed_by=worker, claimed_on=now, attempts=F('attempts') + 1
+    )
+    return list(Job.objects.filter(pk__in=ids, status=Job.RUNNING, claimed_by=worker))
+
+def run_batch(worker, batch_size=JOB_BATCH_SIZE):
+    """
+    Claims and runs one batch of jobs.
+
+    Args:
+        worker: Unique id of the calling worker
+        batch_size: Maximum number of jobs to run
+
+    Returns:
+        tuple: Task name (or None) and number of jobs run
+    """
+    jobs = claim(worker, batch_size)
+    if not jobs:
+        return None, 0
+    name = jobs[0].name
+    # Jobs queued again while an earlier copy was retrying share a key
+    payloads = list({job.key or job.pk: job.payload for job in jobs}.values())
+    try:
+        run_task(name, payloads)
+    except Exception:
+        logger.warning('Job batch %s (%d jobs) failed', name, len(jobs), exc_info=True)
+        fail(jobs, traceback.format_exc())
+    else:
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+    return name, len(jobs)
+
+def fail(jobs, error):
+    """
+    Schedules failed jobs for a retry, or marks them Failed when out of attempts.
+
+    A job whose key was queued again while it ran is dropped instead of
+    retried, since the queued copy does the same work.
+
+    Args:
+        jobs: Jobs from the failed batch
+        error: Formatted traceback stored on the jobs
+    """
+    now = timezone.now()
+    for job in jobs:
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, claimed_by='', last_error=error)
+        else:
+            delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk).update(
+                        status=Job.QUEUED,
+                        claimed_by='',
+                        run_after=now + datetime.timedelta(seconds=delay),
+                        last_error=error,
+                    )
+            except IntegrityError:
+                Job.objects.filter(pk=job.pk).delete()
+
+def run_pending(batch_size=JOB_BATCH_SIZE):
+    """
+    Runs batches until no job is due.
+
+    Args:
+        batch_size: Maximum number of jobs per batch
+
+    Returns:
+        int: Number of jobs run, including failed ones
+    """
+    worker = uuid.uuid4().hex
+    total = 0
+    while True:
+        name, count = run_batch(worker, batch_size)
+        if not count:
+            return total
+        total += count
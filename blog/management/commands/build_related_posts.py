@@ -0,0 +1,27 @@
+"""
+Build Related Posts Command - Rebuilds the related-posts index
+=============================================
+Recomputes ``RelatedPost`` rows and the stored term index for every
+published post in one batch. Changed posts are kept up to date by the
+``post_changed`` background job; this command is meant for the initial build
+and for periodic full refreshes, which also bring the scores of unchanged
+posts in line with the current document frequencies.
+
+Usage:
+    python manage.py build_related_posts
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import related
+
+class Command(BaseCommand):
+    help = 'Rebuilds the related-posts index for all published posts'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = related.rebuild_index()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS('Indexed related posts for %d posts in %.2fs' % (count, elapsed)))
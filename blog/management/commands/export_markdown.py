@@ -0,0 +1,86 @@
+"""
+Export Markdown Command - Writes posts back out as Markdown files
+=============================================
+Streams posts from the database in primary-key order and writes each one to
+``<slug>.md`` with a front matter block that ``import_markdown`` can read.
+
+Posts are fetched in keyset-paginated batches of plain rows, so memory use
+stays flat no matter how many posts the blog has.
+
+Usage:
+    python manage.py export_markdown path/to/output
+"""
+
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from blog import frontmatter
+from blog.models import Post
+
+class Command(BaseCommand):
+    help = 'Exports posts to Markdown files with front matter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory the .md files are written to')
+        parser.add_argument('--batch-size', type=int, default=500, help='Posts fetched per query')
+        parser.add_argument('--published-only', action='store_true', help='Skip draft posts')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        directory.mkdir(parents=True, exist_ok=True)
+        batch_size = max(1, options['batch_size'])
+
+        queryset = Post.objects.order_by('pk')
+        if options['published_only']:
+            queryset = queryset.filter(status=1)
+
+        started = time.monotonic()
+        exported = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                queryset.filter(pk__gt=last_pk).values(
+                    'id', 'title', 'slug', 'author__username', 'created_on', 'status', 'content'
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            categories = self.get_categories([row['id'] for row in rows])
+            for row in rows:
+                meta = {
+                    'title': row['title'],
+                    'slug': row['slug'],
+                    'author': row['author__username'],
+                    'date': row['created_on'].isoformat(),
+                    'status': 'published' if row['status'] == 1 else 'draft',
+                    'categories': categories.get(row['id'], []),
+                }
+                path = directory / ('%s.md' % row['slug'])
+                path.write_text(frontmatter.dump(meta, row['content']), encoding='utf-8')
+            exported += len(rows)
+            last_pk = rows[-1]['id']
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Exported %d posts to %s in %.2fs' % (exported, directory, elapsed)
+        ))
+
+    def get_categories(self, post_ids):
+        """
+        Looks up category names for a batch of posts with one query.
+
+        Args:
+            post_ids: Primary keys of the posts in the batch
+
+        Returns:
+            dict: Post id mapped to a list of category names
+        """
+        categories = {}
+        links = Post.categories.through.objects.filter(post_id__in=post_ids).values_list(
+            'post_id', 'category__name'
+        )
+        for post_id, name in links:
+            categories.setdefault(post_id, []).append(name)
+        return categories
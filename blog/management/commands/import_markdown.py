@@ -0,0 +1,284 @@
+"""
+Import Markdown Command - Bulk loads posts from Markdown files
+=============================================
+Reads ``*.md`` files with front matter from a directory and creates the
+matching ``Post`` and ``Category`` rows plus the ``Post.categories`` links.
+
+Files are read, parsed and rendered (for the table of contents and reading
+time, see ``blog.outline``) in a pool of worker processes, while the database
+work happens in chunks: each chunk runs in one transaction and uses a handful
+of ``bulk_create`` statements instead of one ``save()`` and ``add()`` per post.
+
+Usage:
+    python manage.py import_markdown path/to/posts --author admin
+"""
+
+import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import slugify
+
+from blog import caching, frontmatter, postindex, purge
+from blog.outline import extract_outline
+from blog.rendering import convert
+from blog.models import Post, Category
+from blog.tasks import queue_post_changed
+
+STATUS_VALUES = {'0': 0, 'draft': 0, '1': 1, 'published': 1}
+
+def load_file(path):
+    """
+    Reads one Markdown file and normalizes its front matter.
+
+    Runs inside a worker process, so it only returns plain data. The
+    Markdown is rendered here without the cache, since ``bulk_create`` skips
+    ``Post.save()`` where the outline is normally computed.
+
+    Args:
+        path: Path of the Markdown file
+
+    Returns:
+        dict: Post fields parsed from the file
+    """
+    path = Path(path)
+    meta, body = frontmatter.parse(path.read_text(encoding='utf-8'))
+    title = meta.get('title') or path.stem.replace('-', ' ').replace('_', ' ').title()
+    categories = meta.get('categories') or []
+    if isinstance(categories, str):
+        categories = [name for name in categories.split(',') if name.strip()]
+    return {
+        'path': str(path),
+        'title': title[:200],
+        'slug': slugify(meta.get('slug') or title)[:200],
+        'author': meta.get('author'),
+        'date': meta.get('date'),
+        'status': STATUS_VALUES.get(str(meta.get('status', 'published')).lower(), 1),
+        'categories': [name.strip() for name in categories],
+        'content': body,
+        'outline': extract_outline(convert(body)),
+    }
+
+def parse_timestamp(value):
+    """
+    Converts a front matter date or datetime string to an aware datetime.
+
+    Args:
+        value: Date string such as ``2024-05-01`` or ``2024-05-01 10:30``
+
+    Returns:
+        datetime or None: Parsed datetime, or None if missing or invalid
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.datetime(day.year, day.month, day.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+class Command(BaseCommand):
+    help = 'Imports posts and categories from a directory of Markdown files with front matter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory containing .md files (searched recursively)')
+        parser.add_argument('--author', help='Username used when a file has no author (default: first superuser)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Posts inserted per transaction')
+        parser.add_argument('--workers', type=int, default=None, help='Processes used to read and parse files')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError('%s is not a directory' % directory)
+        paths = sorted(str(path) for path in directory.rglob('*.md'))
+        batch_size = max(1, options['batch_size'])
+
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.default_author = self.get_default_author(options['author'])
+        # Category name mapped to its id, or None when it cannot be imported
+        self.categories = {}
+        self.category_slugs = {}
+        for pk, name, slug in Category.objects.values_list('id', 'name', 'slug'):
+            self.categories[name] = pk
+            self.category_slugs[slug] = (pk, name)
+        # Ids of the created posts and the surrogate keys of pages listing them
+        self.created_ids = []
+        self.purge_keys = {purge.SIDEBAR_KEY, purge.POST_LIST_KEY}
+
+        started = time.monotonic()
+        created = skipped = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            batch = []
+            for entry in pool.map(load_file, paths, chunksize=64):
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    added, ignored = self.import_batch(batch)
+                    created += added
+                    skipped += ignored
+                    batch = []
+            if batch:
+                added, ignored = self.import_batch(batch)
+                created += added
+                skipped += ignored
+        if created:
+            # Bulk inserts skip model signals, so the sidebar, listing pages
+            # and the posts' background work are taken care of here
+            caching.invalidate(caching.CATEGORIES_CACHE_KEY)
+            caching.invalidate(caching.ARCHIVES_CACHE_KEY)
+            postindex.invalidate()
+            for post_id in self.created_ids:
+                queue_post_changed(post_id)
+            purge.purge(sorted(self.purge_keys))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %d posts (%d skipped) from %d files in %.2fs' % (created, skipped, len(paths), elapsed)
+        ))
+
+    def get_default_author(self, username):
+        """
+        Resolves the author id used for files without an ``author`` key.
+
+        Args:
+            username: Username given on the command line, or None
+
+        Returns:
+            int: User id
+        """
+        if username:
+            if username not in self.authors:
+                raise CommandError('User "%s" does not exist' % username)
+            return self.authors[username]
+        author_id = User.objects.filter(is_superuser=True).order_by('pk').values_list('id', flat=True).first()
+        if author_id is None:
+            raise CommandError('No superuser found; pass --author')
+        return author_id
+
+    def import_batch(self, entries):
+        """
+        Inserts one chunk of parsed files inside a single transaction.
+
+        Args:
+            entries: Parsed file dictionaries from ``load_file``
+
+        Returns:
+            tuple: Number of posts created and number skipped
+        """
+        # Drop slugs that already exist or repeat within the batch
+        existing = set(Post.objects.filter(slug__in=[e['slug'] for e in entries]).values_list('slug', flat=True))
+        fresh = []
+        for entry in entries:
+            if entry['slug'] and entry['slug'] not in existing:
+                existing.add(entry['slug'])
+                fresh.append(entry)
+            else:
+                self.stderr.write('Skipping %s: slug "%s" already exists' % (entry['path'], entry['slug']))
+        if not fresh:
+            return 0, len(entries)
+
+        with transaction.atomic():
+            self.create_categories(fresh)
+            posts = Post.objects.bulk_create([
+                Post(
+                    title=entry['title'],
+                    slug=entry['slug'],
+                    author_id=self.authors.get(entry['author'], self.default_author),
+                    content=entry['content'],
+                    status=entry['status'],
+                    **entry['outline'],
+                )
+                for entry in fresh
+            ])
+
+            # auto_now_add overrides dates in bulk_create, so restore them afterwards
+            dated = []
+            for post, entry in zip(posts, fresh):
+                timestamp = parse_timestamp(entry['date'])
+                if timestamp:
+                    post.created_on = post.updated_on = timestamp
+                    dated.append(post)
+            if dated:
+                Post.objects.bulk_update(dated, ['created_on', 'updated_on'])
+
+            Link = Post.categories.through
+            links = [
+                Link(post_id=post.pk, category_id=pk)
+                for post, entry in zip(posts, fresh)
+                for pk in dict.fromkeys(self.categories[name] for name in entry['categories'])
+                if pk is not None
+            ]
+            Link.objects.bulk_create(links)
+
+        category_slugs = {pk: slug for slug, (pk, name) in self.category_slugs.items()}
+        self.purge_keys.update(purge.category_key(category_slugs[link.category_id]) for link in links)
+        for post in posts:
+            self.created_ids.append(post.pk)
+            self.purge_keys.update(purge.archive_keys(post.created_on))
+        return len(posts), len(entries) - len(posts)
+
+    def create_categories(self, entries):
+        """
+        Creates any categories referenced by the entries that do not exist yet.
+
+        Names are matched to categories by slug, so "Django" and "django"
+        end up in one category. Names that match an existing category under
+        another spelling, or have no usable slug, are reported.
+
+        Args:
+            entries: Parsed file dictionaries from ``load_file``
+        """
+        missing = {}
+        for entry in entries:
+            for name in entry['categories']:
+                if name in self.categories or name in missing:
+                    continue
+                slug = slugify(name)[:100]
+                if not slug:
+                    self.stderr.write('Skipping category "%s" in %s: it has no usable slug' % (name, entry['path']))
+                    self.categories[name] = None
+                elif slug in self.category_slugs:
+                    self.use_category(name, slug)
+                else:
+                    missing[name] = slug
+        if not missing:
+            return
+
+        # The first spelling of a new slug names the category
+        names = {}
+        for name, slug in missing.items():
+            names.setdefault(slug, name)
+        Category.objects.bulk_create(
+            [Category(name=name[:100], slug=slug) for slug, name in names.items()], ignore_conflicts=True
+        )
+        for pk, name, slug in Category.objects.filter(slug__in=names).values_list('id', 'name', 'slug'):
+            self.category_slugs[slug] = (pk, name)
+        for name, slug in missing.items():
+            if slug in self.category_slugs:
+                self.use_category(name, slug)
+            else:
+                # Another category already has this name under a different slug
+                self.stderr.write('Skipping category "%s": its name is taken by another category' % name)
+                self.categories[name] = None
+
+    def use_category(self, name, slug):
+        """
+        Maps a category name from the files to the category with its slug.
+
+        Args:
+            name: Category name as written in the front matter
+            slug: Slug of an existing category
+        """
+        pk, existing = self.category_slugs[slug]
+        if existing != name:
+            self.stderr.write('Category "%s" has the same slug as "%s"; using "%s"' % (name, existing, existing))
+        self.categories[name] = pk
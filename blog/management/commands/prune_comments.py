@@ -0,0 +1,87 @@
+"""
+Prune Comments Command - Deletes stale unapproved comments
+=============================================
+Removes unapproved comments older than the retention period so spam does not
+pile up in the ``Comment`` table and its indexes.
+
+Rows are deleted in small batches, each in its own short transaction, with an
+optional pause between batches. SQLite only allows one writer at a time, so
+this keeps the write lock free for comment submissions and admin edits while
+the command runs. With ``--continuous`` the command keeps running at reduced
+CPU priority and prunes again every ``--interval`` seconds.
+
+Usage:
+    python manage.py prune_comments --days 30
+    python manage.py prune_comments --continuous --interval 3600 --sleep 0.5
+"""
+
+import datetime
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog.models import Comment
+
+class Command(BaseCommand):
+    help = 'Deletes unapproved comments older than the retention period in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'COMMENT_RETENTION_DAYS', 30),
+            help='Delete unapproved comments older than this many days',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Comments deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches')
+        parser.add_argument('--continuous', action='store_true', help='Keep running and prune periodically')
+        parser.add_argument('--interval', type=int, default=3600, help='Seconds between runs with --continuous')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the comments that would be deleted')
+
+    def handle(self, *args, **options):
+        if options['continuous'] and hasattr(os, 'nice'):
+            # Yield the CPU to the web workers
+            os.nice(10)
+        while True:
+            self.prune(options)
+            if not options['continuous']:
+                break
+            time.sleep(options['interval'])
+
+    def prune(self, options):
+        """
+        Runs one pruning pass over the comment table.
+
+        Args:
+            options: Parsed command options
+        """
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        stale = Comment.objects.filter(approved=False, created_on__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write('%d unapproved comments older than %s would be deleted' % (stale.count(), cutoff))
+            return
+
+        batch_size = max(1, options['batch_size'])
+        started = time.monotonic()
+        deleted = batches = 0
+        while True:
+            with transaction.atomic():
+                ids = list(stale.order_by('created_on').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                count, _ = Comment.objects.filter(id__in=ids).delete()
+            deleted += count
+            batches += 1
+            if options['verbosity'] > 1:
+                self.stdout.write('  batch %d: %d deleted' % (batches, count))
+            if len(ids) < batch_size:
+                break
+            time.sleep(options['sleep'])
+
+        elapsed = time.monotonic() - started
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted %d stale comments in %d batches in %.2fs (%.0f comments/s)' % (deleted, batches, elapsed, rate)
+        ))
@@ -0,0 +1,53 @@
+"""
+Run Jobs Command - Background worker for the job queue
+=============================================
+Runs the jobs queued by ``blog.jobs`` (rendering saved posts, updating the
+related-posts index, purging the reverse-proxy cache, ...).
+
+The worker claims due jobs in batches of one task, runs them and polls the
+``Job`` table again after ``--interval`` seconds when nothing is due. Several
+workers may run at the same time; a job is only ever claimed by one of them.
+With ``--once`` the command exits as soon as the queue is empty, which suits
+a cron job or a deploy script.
+
+Usage:
+    python manage.py run_jobs
+    python manage.py run_jobs --once --batch-size 100
+"""
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from blog import jobs
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due instead of polling')
+        parser.add_argument('--batch-size', type=int, default=jobs.JOB_BATCH_SIZE, help='Jobs run per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        worker = uuid.uuid4().hex
+        batch_size = max(1, options['batch_size'])
+        total = 0
+        try:
+            while True:
+                started = time.monotonic()
+                name, count = jobs.run_batch(worker, batch_size)
+                if count:
+                    total += count
+                    if options['verbosity'] > 1:
+                        self.stdout.write('  %s: %d jobs in %.1f ms' % (
+                            name, count, (time.monotonic() - started) * 1000
+                        ))
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Ran %d jobs' % total))
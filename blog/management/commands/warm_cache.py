@@ -0,0 +1,145 @@
+"""
+Warm Cache Command - Pre-renders pages after a deploy or cache flush
+=============================================
+Requests the pages visitors are most likely to hit first so their Markdown
+rendering, sidebar queries and cached fragments are computed before real
+traffic arrives:
+- The home page
+- The most recent and the most viewed posts
+- The first page of every category
+- Every archive month
+
+By default pages are rendered in-process through Django's test client, which
+fills shared cache backends (database, file, memcached, Redis). That would
+warm nothing with a local-memory cache, which disappears when the command
+exits, so the command refuses to run that way. With ``--base-url`` the pages
+are fetched over HTTP from the running site instead, which also warms
+per-process caches inside the web workers.
+
+Usage:
+    python manage.py warm_cache --posts 20 --concurrency 4
+    python manage.py warm_cache --base-url https://example.com
+"""
+
+import datetime
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from blog import pageviews
+from blog.models import Post, Category, PostView
+from blog.sitemaps import archive_months
+
+# Cache backends that live inside the process, so warming them in-process is useless
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+class Command(BaseCommand):
+    help = 'Pre-renders the most visited pages to warm the caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20, help='Number of recent and of popular posts to warm')
+        parser.add_argument('--concurrency', type=int, default=4, help='Maximum pages rendered at the same time')
+        parser.add_argument('--base-url', help='Fetch pages over HTTP from this site instead of rendering in-process')
+        parser.add_argument('--host', help='Host header for in-process rendering (default: first ALLOWED_HOSTS entry)')
+
+    def handle(self, *args, **options):
+        self.base_url = (options['base_url'] or '').rstrip('/')
+        backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+        if not self.base_url and backend in LOCAL_CACHE_BACKENDS:
+            raise CommandError(
+                'The default cache (%s) is local to this process, so rendering pages here warms nothing; '
+                'pass --base-url to warm the running site' % backend.rsplit('.', 1)[-1]
+            )
+        self.host = options['host'] or next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost'
+        )
+        self.local = threading.local()
+
+        paths = self.get_paths(options['posts'])
+        self.stdout.write('Warming %d pages with concurrency %d...' % (len(paths), options['concurrency']))
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+            results = list(pool.map(self.warm, paths))
+        elapsed = time.monotonic() - started
+
+        failures = [(path, status) for path, status, duration in results if status != 200]
+        for path, status in failures:
+            self.stderr.write('Failed to warm %s (status %s)' % (path, status))
+        slowest = sorted(results, key=lambda result: result[2], reverse=True)[:5]
+        for path, status, duration in slowest:
+            self.stdout.write('  %7.1f ms  %s' % (duration * 1000, path))
+        total = sum(duration for path, status, duration in results)
+        self.stdout.write(self.style.SUCCESS(
+            'Warmed %d of %d pages in %.2fs (%.2fs of rendering)' % (
+                len(results) - len(failures), len(results), elapsed, total
+            )
+        ))
+
+    def get_paths(self, count):
+        """
+        Collects the URLs to warm, without duplicates and in priority order.
+
+        Args:
+            count: Number of recent and of popular posts to include
+
+        Returns:
+            list: URL paths
+        """
+        paths = [reverse('blog:home')]
+        recent = Post.objects.filter(status=1).order_by('-created_on').values_list('slug', flat=True)[:count]
+        since = timezone.localdate() - datetime.timedelta(days=pageviews.POPULAR_POSTS_DAYS - 1)
+        popular = (
+            PostView.objects.filter(day__gte=since, post__status=1)
+            .values('post__slug')
+            .annotate(views=Sum('count'))
+            .order_by('-views')
+            .values_list('post__slug', flat=True)[:count]
+        )
+        for slug in list(recent) + list(popular):
+            paths.append(reverse('blog:post_detail', args=[slug]))
+        for slug in Category.objects.order_by('name').values_list('slug', flat=True):
+            paths.append(reverse('blog:category', args=[slug]))
+        for row in archive_months():
+            paths.append(reverse('blog:archive_month', args=[row['month'].year, row['month'].month]))
+        return list(dict.fromkeys(paths))
+
+    def warm(self, path):
+        """
+        Renders or fetches a single page.
+
+        Args:
+            path: URL path to warm
+
+        Returns:
+            tuple: Path, HTTP status and duration in seconds
+        """
+        started = time.monotonic()
+        try:
+            if self.base_url:
+                request = urllib.request.Request(self.base_url + path, headers={'X-Cache-Warming': '1'})
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    status = response.status
+            else:
+                if not hasattr(self.local, 'client'):
+                    self.local.client = Client(HTTP_HOST=self.host, HTTP_X_CACHE_WARMING='1')
+                status = self.local.client.get(path).status_code
+        except Exception as exc:
+            status = getattr(exc, 'code', type(exc).__name__)
+        finally:
+            if not self.base_url:
+                connection.close()
+        return path, status, time.monotonic() - started
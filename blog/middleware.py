@@ -0,0 +1,108 @@
+"""
+Blog Middleware - Preload hints for critical assets
+=============================================
+Browsers only discover ``style.css`` and ``main.js`` once they have parsed
+the ``<head>`` of a page. This module announces them earlier:
+
+- ``PreloadMiddleware`` adds a ``Link: <...>; rel=preload`` header to the
+  blog's HTML responses (not the admin or the editor, see ``wants_hints()``),
+  so the assets are requested as soon as the headers arrive.
+  CDNs and proxies that support 103 Early Hints (for example Cloudflare, or
+  nginx with ``early_hints``) turn this header into an early hint on their own
+- ``EarlyHintsMiddleware`` wraps the ASGI application and sends a
+  103 Early Hints response with the same links before the view runs, when
+  the ASGI server advertises the ``http.response.early_hint`` extension
+
+The assets are listed in the ``PRELOAD_ASSETS`` setting and resolved through
+the static files storage, so hashed file names are used when configured.
+"""
+
+from django.conf import settings
+
+PRELOAD_ASSETS = getattr(settings, 'PRELOAD_ASSETS', [('css/style.css', 'style'), ('js/main.js', 'script')])
+PRELOAD_PRECONNECT = getattr(settings, 'PRELOAD_PRECONNECT', [])
+# Paths that never return pages using the assets, skipped for preload hints
+PRELOAD_EXCLUDE_PREFIXES = getattr(settings, 'PRELOAD_EXCLUDE_PREFIXES', ('/admin/', '/api/', '/mdeditor/'))
+
+_links = None
+
+def preload_links():
+    """
+    Returns the ``Link`` header values for the critical assets.
+
+    Resolved once per process, since static URLs do not change at runtime.
+
+    Returns:
+        list: Header values such as ``</static/css/style.css>; rel=preload; as=style``
+    """
+    global _links
+    if _links is None:
+        from django.templatetags.static import static
+        links = [
+            '<%s>; rel=preconnect%s' % (origin, '; crossorigin' if crossorigin else '')
+            for origin, crossorigin in PRELOAD_PRECONNECT
+        ]
+        links += ['<%s>; rel=preload; as=%s' % (static(path), kind) for path, kind in PRELOAD_ASSETS]
+        _links = links
+    return _links
+
+def wants_hints(path):
+    """
+    Says whether a request path may render a page that uses the assets.
+
+    Args:
+        path: Request path
+
+    Returns:
+        bool: False for the admin, the API, sitemaps and static or media files
+    """
+    excluded = tuple(PRELOAD_EXCLUDE_PREFIXES) + tuple(
+        prefix for prefix in (settings.STATIC_URL, getattr(settings, 'MEDIA_URL', '')) if prefix and prefix != '/'
+    )
+    return not path.startswith(excluded) and not path.endswith('.xml')
+
+class PreloadMiddleware:
+    """
+    Adds ``Link: rel=preload`` headers for the critical assets to HTML pages
+    that use them.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.status_code == 200
+            and response.get('Content-Type', '').startswith('text/html')
+            and wants_hints(request.path)
+        ):
+            existing = response.get('Link')
+            links = preload_links()
+            response['Link'] = ', '.join([existing] + links if existing else links)
+        return response
+
+class EarlyHintsMiddleware:
+    """
+    ASGI wrapper that sends 103 Early Hints before the page is rendered.
+
+    Servers without the ``http.response.early_hint`` extension are passed
+    through untouched; ``PreloadMiddleware`` still covers them.
+
+    Args:
+        app: The ASGI application to wrap
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] == 'http'
+            and scope.get('method') == 'GET'
+            and 'http.response.early_hint' in scope.get('extensions', {})
+            and wants_hints(scope.get('path', ''))
+        ):
+            await send({
+                'type': 'http.response.early_hint',
+                'links': [link.encode('latin-1') for link in preload_links()],
+            })
+        await self.app(scope, receive, send)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_relatedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='views', to='blog.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='blog_postvi_day_4ccdb6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'day'), name='unique_post_view_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_postview'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'approved', 'created_on', 'id'], name='comment_post_page_idx'),
+        ),
+    ]
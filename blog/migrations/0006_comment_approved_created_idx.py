@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_comment_post_page_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['approved', 'created_on'], name='comment_approved_created_idx'),
+        ),
+    ]
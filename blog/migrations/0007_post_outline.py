@@ -0,0 +1,108 @@
+# Generated by Django 5.2 on 2026-10-19 15:59
+
+import math
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of blog.outline as of this migration, so later changes to that
+# module do not change what this migration computes
+READING_WORDS_PER_MINUTE = getattr(settings, 'READING_WORDS_PER_MINUTE', 200)
+TOC_MAX_LEVEL = getattr(settings, 'TOC_MAX_LEVEL', 4)
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+
+class OutlineParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.headings = []
+        self.words = 0
+        self.heading = None
+        self.pre_depth = 0
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in HEADING_TAGS:
+            self.heading = {'level': HEADING_TAGS[tag], 'anchor': attrs.get('id') or '', 'parts': []}
+        elif tag == 'pre':
+            self.pre_depth += 1
+        elif tag == 'a' and 'headerlink' in (attrs.get('class') or '').split():
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in HEADING_TAGS and self.heading is not None:
+            heading, self.heading = self.heading, None
+            title = ' '.join(''.join(heading.pop('parts')).split())
+            if title and heading['anchor'] and heading['level'] <= TOC_MAX_LEVEL:
+                heading['title'] = title
+                self.headings.append(heading)
+        elif tag == 'pre' and self.pre_depth:
+            self.pre_depth -= 1
+        elif tag == 'a' and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.heading is not None:
+            self.heading['parts'].append(data)
+        if not self.pre_depth:
+            self.words += len(data.split())
+
+
+def post_outline(content):
+    from markdownify.templatetags.markdownify import markdownify
+
+    parser = OutlineParser()
+    parser.feed(str(markdownify(content)))
+    parser.close()
+    return {
+        'toc': parser.headings,
+        'word_count': parser.words,
+        'reading_time': max(1, math.ceil(parser.words / READING_WORDS_PER_MINUTE)) if parser.words else 0,
+    }
+
+
+def fill_outlines(apps, schema_editor):
+    # Historical models have no custom save(), so compute the outline directly
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=500):
+        data = post_outline(post.content)
+        post.toc = data['toc']
+        post.word_count = data['word_count']
+        post.reading_time = data['reading_time']
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['toc', 'word_count', 'reading_time'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['toc', 'word_count', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_comment_approved_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_outlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='render_time',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
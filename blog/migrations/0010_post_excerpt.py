@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 16:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+# Frozen copy of the excerpt logic of blog.outline as of this migration
+EXCERPT_WORDS = getattr(settings, 'EXCERPT_WORDS', 50)
+
+
+def post_excerpt(content):
+    from markdownify.templatetags.markdownify import markdownify
+
+    return Truncator(str(markdownify(content))).words(EXCERPT_WORDS, html=True, truncate=' …')
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=500):
+        post.excerpt = post_excerpt(post.content)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_render_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 16:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerms',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='terms', serialize=False, to='blog.post')),
+                ('counts', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TermPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_postings', to='blog.post')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'post'), name='unique_term_posting')],
+            },
+        ),
+    ]
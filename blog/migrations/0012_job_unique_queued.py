@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 16:32
+
+from django.db import migrations, models
+
+
+def drop_duplicate_jobs(apps, schema_editor):
+    # Keep the oldest of any queued jobs sharing a name and key
+    Job = apps.get_model('blog', 'Job')
+    seen = set()
+    duplicates = []
+    for pk, name, key in Job.objects.filter(status=0).exclude(key='').order_by('id').values_list('id', 'name', 'key'):
+        if (name, key) in seen:
+            duplicates.append(pk)
+        seen.add((name, key))
+    Job.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_related_terms'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 0), models.Q(('key', ''), _negated=True)), fields=('name', 'key'), name='unique_queued_job'),
+        ),
+    ]
@@ -12,6 +12,8 @@ from django.urls import reverse
 from django.contrib.auth.models import User
 from mdeditor.fields import MDTextField
 
+from . import outline
+
 class Category(models.Model):
     """
     Category model for classifying blog posts.
@@ -69,6 +71,12 @@ class Post(models.Model):
         choices=[(0, "Draft"), (1, "Published")], 
         default=0
     )
+    # Derived from the content by a background job (see blog.tasks and blog.outline)
+    toc = models.JSONField(default=list, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False)  # Minutes
+    excerpt = models.TextField(blank=True, editable=False)  # HTML of the first words, for listing pages
+    render_time = models.FloatField(null=True, blank=True, editable=False)  # Seconds the last full render took
     
     class Meta:
         ordering = ['-created_on']  # Newest posts first
@@ -90,6 +98,16 @@ class Post(models.Model):
             str: URL to the post detail page
         """
         return reverse('blog:post_detail', args=[self.slug])
+    
+    @property
+    def show_toc(self):
+        """
+        Whether the post is long enough to show its table of contents.
+        
+        Returns:
+            bool: True if the post has at least TOC_MIN_HEADINGS headings
+        """
+        return len(self.toc) >= outline.TOC_MIN_HEADINGS
 
 class Comment(models.Model):
     """
@@ -111,6 +129,12 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_on']  # Oldest comments first
+        indexes = [
+            # Serves keyset pagination of approved comments on a post
+            models.Index(fields=['post', 'approved', 'created_on', 'id'], name='comment_post_page_idx'),
+            # Serves the prune_comments retention query
+            models.Index(fields=['approved', 'created_on'], name='comment_approved_created_idx'),
+        ]
     
     def __str__(self):
         """
@@ -120,3 +144,195 @@ class Comment(models.Model):
             str: Description including commenter name and post title
         """
         return f'Comment by {self.name} on {self.post}'
+
+class RelatedPost(models.Model):
+    """
+    Precomputed "related posts" entry linking a post to a similar post.
+    
+    Rows are built by ``blog.related`` from shared categories and content
+    similarity, so the detail page can fetch related posts with one query
+    instead of comparing posts at request time.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_links'
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_from'
+    )
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['-score']  # Most similar first
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='unique_related_post'),
+        ]
+    
+    def __str__(self):
+        """
+        String representation of a related post entry.
+        
+        Returns:
+            str: Description including both post titles and the score
+        """
+        return f'{self.post} -> {self.related} ({self.score:.3f})'
+
+class PostTerms(models.Model):
+    """
+    Term counts of a published post's content.
+    
+    Kept by ``blog.related`` together with ``TermPosting`` so a changed post
+    can be scored against the posts sharing its terms without re-reading and
+    re-tokenizing every post.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='terms'
+    )
+    counts = models.JSONField(default=dict)  # Term -> number of occurrences
+    
+    def __str__(self):
+        """
+        String representation of a post's term counts.
+        
+        Returns:
+            str: The post and its number of distinct terms
+        """
+        return f'{self.post} ({len(self.counts)} terms)'
+
+class TermPosting(models.Model):
+    """
+    Inverted index entry: a term occurs in a published post.
+    
+    Counting the postings of a term gives its document frequency, and the
+    postings of a post's rarest terms are its candidate related posts.
+    """
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='term_postings'
+    )
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'post'], name='unique_term_posting'),
+        ]
+    
+    def __str__(self):
+        """
+        String representation of a posting.
+        
+        Returns:
+            str: The term and the post id
+        """
+        return f'{self.term} -> {self.post_id}'
+
+class PostView(models.Model):
+    """
+    Daily page-view total for a post.
+    
+    Views are counted in memory by ``blog.pageviews`` and flushed here in
+    aggregated batches, so a busy post costs one UPDATE per flush interval
+    rather than one write per request.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='views'
+    )
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='unique_post_view_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+    
+    def __str__(self):
+        """
+        String representation of a daily view total.
+        
+        Returns:
+            str: Description including post title, day and count
+        """
+        return f'{self.post} on {self.day}: {self.count} views'
+
+class Job(models.Model):
+    """
+    Background job waiting to be run by the ``run_jobs`` worker.
+    
+    Jobs are written in the same transaction as the change that caused them,
+    so they only become visible to the worker once that change is committed.
+    Queued jobs with the same name and key are deduplicated (see ``blog.jobs``).
+    Successful jobs are deleted; jobs that exhaust their retries stay here
+    with status Failed and the last error for inspection in the admin.
+    """
+    QUEUED = 0
+    RUNNING = 1
+    FAILED = 2
+    
+    name = models.CharField(max_length=100)  # Task name registered in blog.tasks
+    key = models.CharField(max_length=200, blank=True)  # Deduplication key, e.g. 'post:42'
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.IntegerField(
+        choices=[(QUEUED, "Queued"), (RUNNING, "Running"), (FAILED, "Failed")],
+        default=QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_on = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            models.Index(fields=['name', 'key', 'status'], name='job_name_key_idx'),
+        ]
+        constraints = [
+            # At most one queued job per name and non-empty key
+            models.UniqueConstraint(
+                fields=['name', 'key'],
+                condition=models.Q(status=0) & ~models.Q(key=''),
+                name='unique_queued_job',
+            ),
+        ]
+    
+    def __str__(self):
+        """
+        String representation of a job.
+        
+        Returns:
+            str: Task name and deduplication key
+        """
+        return f'{self.name} {self.key}'.strip()
+
+class PostIndexVersion(models.Model):
+    """
+    Version of the data shown on listing pages, shared by all processes.
+    
+    A single row whose counter is incremented in the same transaction as
+    every change to published posts, categories or authors. Processes compare
+    it with the version of their in-memory post index (see ``blog.postindex``).
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        """
+        String representation of the index version.
+        
+        Returns:
+            str: The version number
+        """
+        return f'Post index version {self.version}'
@@ -0,0 +1,109 @@
+"""
+Blog Outline - Table of contents, word count and reading time for posts
+=============================================
+This module extracts the structure of a post from its rendered HTML: the
+headings with their anchors, the number of words, the estimated reading
+time and the excerpt shown on listing pages.
+
+It runs once after a post is saved, in the ``post_changed`` background job
+(see ``blog.tasks``), and the result is stored on the post, so the templates
+read the table of contents, the "N min read" label and the excerpt directly
+instead of parsing the HTML on every request.
+
+Heading anchors come from Markdown's ``toc`` extension (enabled in the
+``MARKDOWNIFY`` settings), which gives every heading a unique ``id`` and a
+permalink; this module only reads them back.
+"""
+
+import math
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.utils.text import Truncator
+
+from .rendering import render_markdown
+
+READING_WORDS_PER_MINUTE = getattr(settings, 'READING_WORDS_PER_MINUTE', 200)
+TOC_MAX_LEVEL = getattr(settings, 'TOC_MAX_LEVEL', 4)
+TOC_MIN_HEADINGS = getattr(settings, 'TOC_MIN_HEADINGS', 3)
+EXCERPT_WORDS = getattr(settings, 'EXCERPT_WORDS', 50)
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+class OutlineParser(HTMLParser):
+    """
+    Collects headings and counts words in a rendered post.
+
+    Text inside ``<pre>`` blocks is not counted, since code is skimmed rather
+    than read, and the ``toc`` extension's permalink markers are ignored.
+    """
+    def __init__(self):
+        super().__init__()
+        self.headings = []
+        self.words = 0
+        self.heading = None
+        self.pre_depth = 0
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in HEADING_TAGS:
+            self.heading = {'level': HEADING_TAGS[tag], 'anchor': attrs.get('id') or '', 'parts': []}
+        elif tag == 'pre':
+            self.pre_depth += 1
+        elif tag == 'a' and 'headerlink' in (attrs.get('class') or '').split():
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in HEADING_TAGS and self.heading is not None:
+            heading, self.heading = self.heading, None
+            title = ' '.join(''.join(heading.pop('parts')).split())
+            if title and heading['anchor'] and heading['level'] <= TOC_MAX_LEVEL:
+                heading['title'] = title
+                self.headings.append(heading)
+        elif tag == 'pre' and self.pre_depth:
+            self.pre_depth -= 1
+        elif tag == 'a' and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.heading is not None:
+            self.heading['parts'].append(data)
+        if not self.pre_depth:
+            self.words += len(data.split())
+
+def extract_outline(html):
+    """
+    Extracts the table of contents, word count, reading time and excerpt from HTML.
+
+    Args:
+        html: Rendered post content
+
+    Returns:
+        dict: ``toc`` (list of ``{'level', 'anchor', 'title'}``), ``word_count``
+            ``reading_time`` in whole minutes and ``excerpt``, the HTML of
+            the first ``EXCERPT_WORDS`` words
+    """
+    parser = OutlineParser()
+    parser.feed(str(html))
+    parser.close()
+    return {
+        'toc': parser.headings,
+        'word_count': parser.words,
+        'reading_time': max(1, math.ceil(parser.words / READING_WORDS_PER_MINUTE)) if parser.words else 0,
+        'excerpt': Truncator(str(html)).words(EXCERPT_WORDS, html=True, truncate=' …'),
+    }
+
+def post_outline(content):
+    """
+    Renders Markdown (through the rendering cache) and extracts its outline.
+
+    Args:
+        content: Markdown source of a post
+
+    Returns:
+        dict: See ``extract_outline()``
+    """
+    return extract_outline(render_markdown(content))
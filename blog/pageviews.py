@@ -0,0 +1,197 @@
+"""
+Blog Page Views - Buffered view counting and popular posts
+=============================================
+This module counts post views in memory and periodically writes the
+aggregated totals to ``PostView`` rows.
+
+Each worker process keeps its own counter. A background timer flushes it every
+``PAGEVIEW_FLUSH_INTERVAL`` seconds in a single transaction with one
+``UPDATE ... SET count = count + n`` per post and day, so SQLite sees a short
+burst of writes instead of one write per request. Counts still buffered when
+the process exits are flushed by an ``atexit`` hook.
+
+After a flush the popular posts are recomputed; if the list in the sidebar
+changed, the cached list is replaced and the ``sidebar`` surrogate key is
+purged, so pages held by a reverse proxy do not keep an outdated list.
+"""
+
+import atexit
+import datetime
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import purge
+from .caching import CACHE_STALE_TIMEOUT, get_or_compute, remember
+from .models import Post, PostView
+
+logger = logging.getLogger(__name__)
+
+PAGEVIEW_FLUSH_INTERVAL = getattr(settings, 'PAGEVIEW_FLUSH_INTERVAL', 30)
+POPULAR_POSTS_DAYS = getattr(settings, 'POPULAR_POSTS_DAYS', 7)
+POPULAR_POSTS_COUNT = getattr(settings, 'POPULAR_POSTS_COUNT', 5)
+POPULAR_POSTS_CACHE_TIMEOUT = getattr(settings, 'POPULAR_POSTS_CACHE_TIMEOUT', 300)
+
+POPULAR_POSTS_CACHE_KEY = 'sidebar:popular_posts'
+
+class ViewCounter:
+    """
+    Per-process buffer of post views keyed by post id and day.
+
+    ``record()`` only touches an in-memory Counter under a lock; the database
+    is written by ``flush()``, which runs on a daemon timer thread.
+    """
+    def __init__(self, interval=PAGEVIEW_FLUSH_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def record(self, post_id):
+        """
+        Counts one view of a post and makes sure a flush is scheduled.
+
+        Args:
+            post_id: Primary key of the viewed post
+        """
+        with self.lock:
+            self.counts[(post_id, timezone.localdate())] += 1
+            if self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush_from_timer(self):
+        """
+        Timer callback that flushes and releases the thread's DB connection.
+        """
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """
+        Writes buffered counts to the database in one transaction.
+
+        Views of posts deleted since they were counted are dropped first:
+        SQLite only checks foreign keys at COMMIT, so a single one of them
+        would fail the whole batch, and every later batch it is put back in.
+        If the write fails (for example because the database is locked), the
+        counts are put back into the buffer for the next attempt. After a
+        successful write the popular posts are refreshed.
+
+        Returns:
+            int: Number of views written
+        """
+        with self.lock:
+            pending, self.counts = self.counts, Counter()
+            self.timer = None
+        if not pending:
+            return 0
+        try:
+            existing = set(
+                Post.objects.filter(pk__in={post_id for post_id, day in pending}).values_list('id', flat=True)
+            )
+            pending = Counter({key: count for key, count in pending.items() if key[0] in existing})
+            with transaction.atomic():
+                for (post_id, day), count in pending.items():
+                    updated = PostView.objects.filter(post_id=post_id, day=day).update(count=F('count') + count)
+                    if not updated:
+                        try:
+                            with transaction.atomic():
+                                PostView.objects.create(post_id=post_id, day=day, count=count)
+                        except IntegrityError:
+                            # Another worker created the row first
+                            PostView.objects.filter(post_id=post_id, day=day).update(count=F('count') + count)
+        except Exception:
+            with self.lock:
+                self.counts.update(pending)
+            raise
+        if pending:
+            try:
+                refresh_popular_posts()
+            except Exception:
+                logger.warning('Could not refresh popular posts after flushing views', exc_info=True)
+        return sum(pending.values())
+
+counter = ViewCounter()
+atexit.register(counter.flush)
+
+def record_view(request, post):
+    """
+    Counts a view of a post without touching the database.
+
+    Requests made by the ``warm_cache`` command and speculative prefetches
+    made by ``main.js`` (marked with ``Sec-Purpose``/``Purpose: prefetch``)
+    are not counted.
+
+    Args:
+        request: HTTP request for the post
+        post: The viewed post
+    """
+    if 'X-Cache-Warming' in request.headers:
+        return
+    if 'prefetch' in request.headers.get('Sec-Purpose', request.headers.get('Purpose', '')):
+        return
+    counter.record(post.pk)
+
+def compute_popular_posts():
+    """
+    Aggregates the most viewed published posts over the recent window.
+
+    Returns:
+        list: Dictionaries with ``slug``, ``title`` and ``views``
+    """
+    since = timezone.localdate() - datetime.timedelta(days=POPULAR_POSTS_DAYS - 1)
+    rows = (
+        PostView.objects.filter(day__gte=since, post__status=1)
+        .values('post__slug', 'post__title')
+        .annotate(views=Sum('count'))
+        .order_by('-views', 'post__title')[:POPULAR_POSTS_COUNT]
+    )
+    return [
+        {'slug': row['post__slug'], 'title': row['post__title'], 'views': row['views']}
+        for row in rows
+    ]
+
+def get_popular_posts():
+    """
+    Returns the most viewed published posts over the recent window.
+
+    The result is cached for ``POPULAR_POSTS_CACHE_TIMEOUT`` seconds so the
+    sidebar does not aggregate view totals on every request.
+
+    Returns:
+        list: Dictionaries with ``slug``, ``title`` and ``views``
+    """
+    return get_or_compute(POPULAR_POSTS_CACHE_KEY, compute_popular_posts, POPULAR_POSTS_CACHE_TIMEOUT)
+
+def refresh_popular_posts():
+    """
+    Recomputes the popular posts and purges the sidebar if the list changed.
+
+    Only the slugs and titles are shown in the sidebar, so view totals that
+    change without reordering the list do not purge anything.
+
+    Returns:
+        bool: True if the sidebar was purged
+    """
+    popular = compute_popular_posts()
+    stored = cache.get(POPULAR_POSTS_CACHE_KEY)
+    shown = [(post['slug'], post['title']) for post in popular]
+    changed = stored is None or [(post['slug'], post['title']) for post in stored[0]] != shown
+    remember(
+        POPULAR_POSTS_CACHE_KEY, popular, time.time() + POPULAR_POSTS_CACHE_TIMEOUT,
+        POPULAR_POSTS_CACHE_TIMEOUT, CACHE_STALE_TIMEOUT,
+    )
+    if changed:
+        purge.purge([purge.SIDEBAR_KEY])
+    return changed
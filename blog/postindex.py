@@ -0,0 +1,431 @@
+"""
+Blog Post Index - In-memory metadata of published posts for listing pages
+=============================================
+The home page, category pages and archives only show a few columns of each
+post (title, date, author, categories, reading time and excerpt). This module
+keeps those columns for every published post in each process, so listing
+pages are answered without any database query.
+
+The index is stored compactly:
+- Rows are sorted newest first; numeric columns are ``array`` objects and
+  text columns are one joined string with an array of offsets
+- Post categories are stored as one flat array of category ids with
+  per-row offsets
+- Each category keeps an array of the row numbers of its posts
+- Rows of a month or a year are contiguous, so archives are a
+  ``(start, end)`` slice of the rows
+
+Freshness across processes is tracked by a version counter in the database
+(``PostIndexVersion``), incremented in the same transaction as every change
+to posts, categories or authors, so it can never run ahead of the data. Each
+process reads it at most every ``POST_INDEX_CHECK_INTERVAL`` seconds and
+rebuilds its index (three queries) when the version differs. When a post
+changes, the process that saved it re-reads only that post after the commit
+and patches its own index; category and author changes, and bulk changes,
+drop it. Other processes show a change within the check interval.
+"""
+
+import datetime
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .models import Post, Category, PostIndexVersion
+
+POST_INDEX_CHECK_INTERVAL = getattr(settings, 'POST_INDEX_CHECK_INTERVAL', 1)
+
+_index = None
+# time.monotonic() of the last version check
+_checked = 0.0
+_lock = threading.Lock()
+
+class StringColumn:
+    """
+    A column of strings stored as one string and an array of offsets.
+
+    Args:
+        values: The strings, in row order
+    """
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self, values):
+        offsets = array('Q', [0])
+        total = 0
+        for value in values:
+            total += len(value)
+            offsets.append(total)
+        self.data = ''.join(values)
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.data[self.offsets[row]:self.offsets[row + 1]]
+
+class IndexAuthor:
+    """
+    The author fields listing templates use, shared by all of an author's posts.
+    """
+    __slots__ = ('username', 'full_name')
+
+    def __init__(self, username, full_name):
+        self.username = username
+        self.full_name = full_name
+
+    def get_full_name(self):
+        return self.full_name
+
+class IndexCategory:
+    """
+    A category as seen by listing pages and their templates.
+    """
+    __slots__ = ('pk', 'name', 'slug')
+
+    def __init__(self, pk, name, slug):
+        self.pk = pk
+        self.name = name
+        self.slug = slug
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('blog:category', args=[self.slug])
+
+class IndexPost:
+    """
+    A published post as seen by listing pages, read from one row of the index.
+
+    Args:
+        index: The PostIndex holding the row
+        row: Row number
+    """
+    __slots__ = ('pk', 'slug', 'title', 'author', 'created_on', 'updated_on', 'reading_time', 'excerpt', 'category_list')
+
+    def __init__(self, index, row):
+        self.pk = index.ids[row]
+        self.slug = index.slugs[row]
+        self.title = index.titles[row]
+        self.author = index.authors[index.author_rows[row]]
+        self.created_on = datetime.datetime.fromtimestamp(index.created[row], tz=datetime.timezone.utc)
+        self.updated_on = datetime.datetime.fromtimestamp(index.updated[row], tz=datetime.timezone.utc)
+        self.reading_time = index.reading_times[row]
+        self.excerpt = mark_safe(index.excerpts[row])
+        self.category_list = [index.categories[pk] for pk in index.category_ids_of(row)]
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return reverse('blog:post_detail', args=[self.slug])
+
+class PostList:
+    """
+    A sequence of index rows that Django's ``Paginator`` can page through.
+
+    Only the posts of the requested page are turned into ``IndexPost``
+    objects.
+
+    Args:
+        index: The PostIndex holding the rows
+        rows: Row numbers (a ``range`` or an ``array``), newest first
+    """
+    def __init__(self, index, rows):
+        self.index = index
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [IndexPost(self.index, row) for row in self.rows[item]]
+        return IndexPost(self.index, self.rows[item])
+
+    def __iter__(self):
+        return (IndexPost(self.index, row) for row in self.rows)
+
+class PostIndex:
+    """
+    Immutable, column-oriented metadata of all published posts.
+
+    Args:
+        posts: Tuples of (id, slug, title, username, full name, created
+            timestamp, updated timestamp, reading time, excerpt, category ids)
+        categories: Tuples of (id, name, slug)
+        version: Version the index was built for
+    """
+    def __init__(self, posts, categories, version):
+        posts = sorted(posts, key=lambda post: (post[5], post[0]), reverse=True)
+        self.version = version
+        self.categories = {pk: IndexCategory(pk, name, slug) for pk, name, slug in categories}
+        self.category_slugs = {category.slug: category for category in self.categories.values()}
+
+        self.ids = array('q', (post[0] for post in posts))
+        self.slugs = StringColumn([post[1] for post in posts])
+        self.titles = StringColumn([post[2] for post in posts])
+        self.created = array('d', (post[5] for post in posts))
+        self.updated = array('d', (post[6] for post in posts))
+        self.reading_times = array('I', (post[7] for post in posts))
+        self.excerpts = StringColumn([post[8] for post in posts])
+
+        self.authors = []
+        self.author_rows = array('I')
+        author_numbers = {}
+        for post in posts:
+            number = author_numbers.get(post[3])
+            if number is None:
+                number = author_numbers[post[3]] = len(self.authors)
+                self.authors.append(IndexAuthor(post[3], post[4]))
+            self.author_rows.append(number)
+
+        self.category_offsets = array('I', [0])
+        self.category_ids = array('q')
+        rows_by_category = {}
+        for row, post in enumerate(posts):
+            category_ids = [pk for pk in post[9] if pk in self.categories]
+            self.category_ids.extend(category_ids)
+            self.category_offsets.append(len(self.category_ids))
+            for pk in category_ids:
+                rows_by_category.setdefault(pk, array('I')).append(row)
+        self.category_rows = rows_by_category
+
+        self.months = {}
+        self.years = {}
+        tz = timezone.get_current_timezone()
+        for row, created in enumerate(self.created):
+            date = datetime.datetime.fromtimestamp(created, tz=tz)
+            for periods, period in ((self.months, (date.year, date.month)), (self.years, date.year)):
+                start, end = periods.get(period, (row, row))
+                periods[period] = (start, row + 1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def category_ids_of(self, row):
+        """
+        Returns the category ids of one row.
+        """
+        return self.category_ids[self.category_offsets[row]:self.category_offsets[row + 1]]
+
+    def posts(self):
+        """
+        Returns all published posts, newest first.
+
+        Returns:
+            PostList: Pageable posts
+        """
+        return PostList(self, range(len(self)))
+
+    def category(self, slug):
+        """
+        Returns a category by slug.
+
+        Args:
+            slug: Category slug
+
+        Returns:
+            IndexCategory: The category, or None if there is none with that slug
+        """
+        return self.category_slugs.get(slug)
+
+    def category_posts(self, category):
+        """
+        Returns the published posts of a category, newest first.
+
+        Args:
+            category: An IndexCategory
+
+        Returns:
+            PostList: Pageable posts
+        """
+        return PostList(self, self.category_rows.get(category.pk, array('I')))
+
+    def archive_posts(self, year, month=None):
+        """
+        Returns the published posts of a year or month, newest first.
+
+        Args:
+            year: Year
+            month: Optional month
+
+        Returns:
+            PostList: Pageable posts
+        """
+        start, end = self.months.get((year, month), (0, 0)) if month else self.years.get(year, (0, 0))
+        return PostList(self, range(start, end))
+
+    def rows(self):
+        """
+        Yields the rows in the form the constructor accepts.
+        """
+        for row in range(len(self)):
+            author = self.authors[self.author_rows[row]]
+            yield (
+                self.ids[row], self.slugs[row], self.titles[row], author.username, author.full_name,
+                self.created[row], self.updated[row], self.reading_times[row], self.excerpts[row],
+                tuple(self.category_ids_of(row)),
+            )
+
+    def replace(self, post_ids, posts, version):
+        """
+        Returns a new index with some posts re-read from the database.
+
+        Args:
+            post_ids: Ids of the posts to drop
+            posts: Rows of those that are still published
+            version: Version of the new index
+
+        Returns:
+            PostIndex: The patched index
+        """
+        post_ids = set(post_ids)
+        categories = [(pk, category.name, category.slug) for pk, category in self.categories.items()]
+        kept = [row for row in self.rows() if row[0] not in post_ids]
+        return PostIndex(kept + list(posts), categories, version)
+
+def load_posts(post_ids=None):
+    """
+    Reads index rows of published posts from the database.
+
+    Args:
+        post_ids: Only read these posts; all published posts if None
+
+    Returns:
+        list: Rows for the ``PostIndex`` constructor
+    """
+    posts = Post.objects.filter(status=1)
+    links = Post.categories.through.objects.filter(post__status=1)
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+        links = links.filter(post_id__in=post_ids)
+    categories = {}
+    for post_id, category_id in links.values_list('post_id', 'category_id'):
+        categories.setdefault(post_id, []).append(category_id)
+    return [
+        (
+            pk, slug, title, username, ('%s %s' % (first_name, last_name)).strip(),
+            created_on.timestamp(), updated_on.timestamp(), reading_time, excerpt,
+            tuple(sorted(categories.get(pk, ()))),
+        )
+        for pk, slug, title, username, first_name, last_name, created_on, updated_on, reading_time, excerpt in
+        posts.values_list(
+            'id', 'slug', 'title', 'author__username', 'author__first_name', 'author__last_name',
+            'created_on', 'updated_on', 'reading_time', 'excerpt',
+        )
+    ]
+
+def current_version():
+    """
+    Reads the index version from the database.
+
+    Returns:
+        int: Current version, 0 if it was never incremented
+    """
+    return PostIndexVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+def bump_version():
+    """
+    Increments the index version within the current transaction.
+
+    Returns:
+        tuple: Version before and after the increment
+    """
+    with transaction.atomic():
+        if not PostIndexVersion.objects.filter(pk=1).update(version=F('version') + 1):
+            PostIndexVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+        version = current_version()
+    return version - 1, version
+
+def build(version):
+    """
+    Builds the index from the database.
+
+    Args:
+        version: Version the index is built for
+
+    Returns:
+        PostIndex: The new index
+    """
+    categories = list(Category.objects.order_by('pk').values_list('id', 'name', 'slug'))
+    return PostIndex(load_posts(), categories, version)
+
+def get_index():
+    """
+    Returns this process's index, rebuilding it if another process changed posts.
+
+    The version is read from the database at most every
+    ``POST_INDEX_CHECK_INTERVAL`` seconds; in between, no query is made.
+
+    Returns:
+        PostIndex: Index of the published posts
+    """
+    global _index, _checked
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - _checked < POST_INDEX_CHECK_INTERVAL:
+        return index
+    # Read before the posts, so an index is never labeled newer than its data
+    version = current_version()
+    with _lock:
+        index = _index
+        if index is None or index.version != version:
+            index = _index = build(version)
+        _checked = now
+    return index
+
+def refresh_posts(post_ids):
+    """
+    Records a change to some posts and patches this process's index after commit.
+
+    Args:
+        post_ids: Ids of the saved, deleted or recategorized posts
+    """
+    post_ids = list(post_ids)
+    previous, version = bump_version()
+    transaction.on_commit(lambda: patch(post_ids, previous, version))
+
+def patch(post_ids, previous, version):
+    """
+    Re-reads some posts into this process's index.
+
+    If this process's index was not at the version the change was made
+    against, it is dropped instead of patched.
+
+    Args:
+        post_ids: Ids of the changed posts
+        previous: Index version before the change
+        version: Index version after the change
+    """
+    global _index
+    posts = load_posts(post_ids)
+    with _lock:
+        if _index is not None and _index.version == previous:
+            _index = _index.replace(post_ids, posts, version)
+        else:
+            _index = None
+
+def invalidate():
+    """
+    Drops the index in every process once the current transaction commits.
+
+    Used for changes that affect many posts (categories, authors, bulk updates).
+    """
+    bump_version()
+    transaction.on_commit(drop)
+
+def drop():
+    """
+    Drops this process's index, so the next access rebuilds it.
+    """
+    global _index
+    with _lock:
+        _index = None
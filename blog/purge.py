@@ -0,0 +1,141 @@
+"""
+Blog Purge - Surrogate keys and reverse-proxy cache purging
+=============================================
+This module lets a caching reverse proxy (Varnish with xkey, Fastly, nginx
+with a purge module, ...) store the blog's HTML and drop exactly the pages
+that went stale.
+
+Every blog response is tagged with a ``Surrogate-Key`` header listing what it
+was built from:
+- ``post-<id>`` for each post shown on the page
+- ``category-<slug>`` for category pages and posts in that category
+- ``archive-<year>`` / ``archive-<year>-<month>`` for archive pages
+- ``post-list`` for every paginated listing
+- ``sidebar`` for every page with the sidebar
+
+When content changes, signal handlers (see ``blog.signals``) queue the keys
+that should be purged as background jobs (see ``blog.jobs``). The worker
+merges all pending keys, so a burst of changes turns into a few batched
+purge requests sent to ``PURGE_ENDPOINT``. The sidebar is also purged when
+flushed page views change the popular posts (see ``blog.pageviews``).
+"""
+
+import urllib.request
+
+from django.conf import settings
+
+from . import jobs
+
+PURGE_TASK = 'purge'
+SIDEBAR_KEY = 'sidebar'
+POST_LIST_KEY = 'post-list'
+
+def post_key(post_id):
+    """
+    Returns the surrogate key for a single post.
+
+    Args:
+        post_id: Primary key of the post
+
+    Returns:
+        str: Surrogate key
+    """
+    return 'post-%s' % post_id
+
+def category_key(slug):
+    """
+    Returns the surrogate key for a category.
+
+    Args:
+        slug: Category slug
+
+    Returns:
+        str: Surrogate key
+    """
+    return 'category-%s' % slug
+
+def archive_keys(date):
+    """
+    Returns the surrogate keys for the year and month archives of a date.
+
+    Args:
+        date: Date or datetime within the archive period
+
+    Returns:
+        list: Year and month surrogate keys
+    """
+    return ['archive-%d' % date.year, 'archive-%d-%02d' % (date.year, date.month)]
+
+def tag_response(response, keys):
+    """
+    Adds surrogate keys to a response, merging with any already present.
+
+    Args:
+        response: HttpResponse to tag
+        keys: Iterable of surrogate keys
+
+    Returns:
+        HttpResponse: The same response
+    """
+    existing = response.get('Surrogate-Key', '').split()
+    response['Surrogate-Key'] = ' '.join(dict.fromkeys(existing + list(keys)))
+    surrogate_control = getattr(settings, 'PURGE_SURROGATE_CONTROL', None)
+    if surrogate_control:
+        response['Surrogate-Control'] = surrogate_control
+    return response
+
+def purge_now(keys):
+    """
+    Sends surrogate keys to the purge endpoint in batches of ``PURGE_BATCH_SIZE``.
+
+    Args:
+        keys: Surrogate keys to purge
+
+    Returns:
+        int: Number of purge requests sent
+
+    Raises:
+        OSError: If a purge request fails, so the job running it is retried
+    """
+    endpoint = getattr(settings, 'PURGE_ENDPOINT', None)
+    keys = sorted(set(keys))
+    if not keys or not endpoint:
+        return 0
+    batch_size = getattr(settings, 'PURGE_BATCH_SIZE', 100)
+    for start in range(0, len(keys), batch_size):
+        send_purge(endpoint, keys[start:start + batch_size])
+    return (len(keys) + batch_size - 1) // batch_size
+
+def send_purge(endpoint, keys):
+    """
+    Sends one purge request listing the keys in the ``Surrogate-Key`` header.
+
+    Args:
+        endpoint: URL of the proxy's purge endpoint
+        keys: Surrogate keys to purge
+    """
+    headers = dict(getattr(settings, 'PURGE_HEADERS', {}))
+    headers['Surrogate-Key'] = ' '.join(keys)
+    request = urllib.request.Request(
+        endpoint,
+        method=getattr(settings, 'PURGE_METHOD', 'PURGE'),
+        headers=headers,
+    )
+    with urllib.request.urlopen(request, timeout=getattr(settings, 'PURGE_TIMEOUT', 5)) as response:
+        response.read()
+
+def purge(keys):
+    """
+    Queues surrogate keys to be purged once the current transaction has committed.
+
+    The keys are sent by the background worker (see ``blog.tasks``), which
+    merges the keys of all pending purge jobs into a few batched requests
+    and retries them if the proxy is unreachable. Does nothing unless
+    ``PURGE_ENDPOINT`` is configured.
+
+    Args:
+        keys: Iterable of surrogate keys
+    """
+    if not getattr(settings, 'PURGE_ENDPOINT', None):
+        return
+    jobs.enqueue(PURGE_TASK, payload={'keys': sorted(set(keys))})
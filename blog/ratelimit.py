@@ -0,0 +1,170 @@
+"""
+Blog Rate Limiting - Token-bucket limiter for write endpoints
+=============================================
+This module provides a token-bucket rate limiter used to stop comment floods
+before they reach the database.
+
+Every limiter checks two buckets per key:
+- A per-process bucket kept in memory, which rejects a flood hitting the same
+  worker without any I/O
+- A shared bucket stored in the Django cache, so the limit also holds across
+  workers when a shared cache backend is configured
+
+Buckets refill continuously at ``capacity / period`` tokens per second and
+each allowed request consumes one token. ``allow_all()`` checks several
+limiters first and only consumes tokens if all of them allow the action, so
+a request rejected by one limit does not use up another.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+class TokenBucket:
+    """
+    A bucket holding up to ``capacity`` tokens that refills over time.
+    """
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+    def available(self, capacity, rate, now):
+        """
+        Says whether a token could be taken now, without taking it.
+
+        Args:
+            capacity: Maximum number of tokens
+            rate: Tokens added per second
+            now: Current timestamp in seconds
+
+        Returns:
+            bool: True if at least one token is available
+        """
+        return min(capacity, self.tokens + (now - self.updated) * rate) >= 1
+
+    def consume(self, capacity, rate, now):
+        """
+        Refills the bucket for the elapsed time and takes one token if possible.
+
+        Args:
+            capacity: Maximum number of tokens
+            rate: Tokens added per second
+            now: Current timestamp in seconds
+
+        Returns:
+            bool: True if a token was taken
+        """
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class RateLimiter:
+    """
+    Allows ``capacity`` actions per ``period`` seconds for each key.
+
+    Args:
+        name: Prefix for shared cache keys, e.g. 'comment-ip'
+        capacity: Burst size and number of actions allowed per period
+        period: Length of the period in seconds
+        max_local_keys: Number of in-memory buckets kept before the least
+            recently used ones are dropped
+    """
+    def __init__(self, name, capacity, period, max_local_keys=10000):
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.max_local_keys = max_local_keys
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    def check(self, key):
+        """
+        Says whether an attempt for ``key`` would be allowed, without recording it.
+
+        Args:
+            key: Identifier being limited, such as an IP address or post id
+
+        Returns:
+            bool: True if ``allow()`` would currently succeed
+        """
+        now = time.time()
+        with self.lock:
+            bucket = self.local.get(key)
+            if bucket is not None and not bucket.available(self.capacity, self.rate, now):
+                return False
+        shared = cache.get('ratelimit:%s:%s' % (self.name, key))
+        return shared is None or TokenBucket(*shared).available(self.capacity, self.rate, now)
+
+    def allow(self, key):
+        """
+        Records an attempt for ``key`` and says whether it is within the limit.
+
+        Args:
+            key: Identifier being limited, such as an IP address or post id
+
+        Returns:
+            bool: True if the action may proceed
+        """
+        now = time.time()
+
+        # Fast path: the local bucket rejects floods without touching the cache
+        with self.lock:
+            bucket = self.local.pop(key, None) or TokenBucket(self.capacity, now)
+            self.local[key] = bucket
+            if len(self.local) > self.max_local_keys:
+                self.local.popitem(last=False)
+            if not bucket.consume(self.capacity, self.rate, now):
+                return False
+
+        cache_key = 'ratelimit:%s:%s' % (self.name, key)
+        tokens, updated = cache.get(cache_key) or (self.capacity, now)
+        shared = TokenBucket(tokens, updated)
+        allowed = shared.consume(self.capacity, self.rate, now)
+        cache.set(cache_key, (shared.tokens, shared.updated), self.period * 2)
+        return allowed
+
+def allow_all(*checks):
+    """
+    Records an attempt with several limiters if all of them allow it.
+
+    Tokens are only consumed once every limiter has been checked, so an
+    attempt rejected by one limit does not count against the others.
+
+    Args:
+        checks: Tuples of (RateLimiter, key)
+
+    Returns:
+        bool: True if the action may proceed
+    """
+    if not all(limiter.check(key) for limiter, key in checks):
+        return False
+    # Another request may have taken the last token in between; consume all
+    # buckets anyway so they stay consistent, and reject if any ran out
+    results = [limiter.allow(key) for limiter, key in checks]
+    return all(results)
+
+def get_client_ip(request, trust_forwarded=False):
+    """
+    Returns the address a request came from.
+
+    Args:
+        request: HTTP request
+        trust_forwarded: Use the first ``X-Forwarded-For`` entry, which is only
+            safe behind a proxy that sets it
+
+    Returns:
+        str: Client IP address
+    """
+    if trust_forwarded:
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
@@ -0,0 +1,441 @@
+"""
+Blog Related Posts - Builds the precomputed related-posts index
+=============================================
+This module scores how similar published posts are and stores the best
+matches for each post as ``RelatedPost`` rows.
+
+The score combines two signals:
+- Category overlap (Jaccard similarity of category sets)
+- Content similarity (cosine similarity of TF-IDF term vectors)
+
+Term vectors are sparse, so similarities are computed through an inverted
+index (term -> postings) rather than comparing every pair of posts: only posts
+that share at least one term or category are ever scored.
+
+The whole index can be rebuilt in batch (``build_related_posts``). Changed
+posts are updated incrementally: the term counts of every published post
+(``PostTerms``) and the inverted index (``TermPosting``) are stored, so a
+changed post is re-tokenized alone and scored only against the posts that
+share its most distinctive terms or one of its categories, with document
+frequencies counted from the postings.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Post, PostTerms, RelatedPost, TermPosting
+
+RELATED_POSTS_COUNT = getattr(settings, 'RELATED_POSTS_COUNT', 5)
+CATEGORY_WEIGHT = getattr(settings, 'RELATED_POSTS_CATEGORY_WEIGHT', 0.4)
+CONTENT_WEIGHT = getattr(settings, 'RELATED_POSTS_CONTENT_WEIGHT', 0.6)
+# Highest-weighted terms of a changed post whose postings give its candidates
+QUERY_TERMS = getattr(settings, 'RELATED_POSTS_QUERY_TERMS', 25)
+
+MAX_TERM_LENGTH = 64
+# Ids per IN clause, well below SQLite's parameter limit
+CHUNK_SIZE = 500
+
+TOKEN_RE = re.compile(r'[a-z][a-z0-9_+#-]{2,}')
+CODE_BLOCK_RE = re.compile(r'```.*?```', re.DOTALL)
+STOP_WORDS = frozenset("""
+    the and for are but not you all any can had her was one our out has have this that with
+    from they will would there their what about which when your into than then them these
+    some could also just like more most such only over very been were here how its use using
+""".split())
+
+def tokenize(text):
+    """
+    Splits Markdown content into lowercase terms, ignoring code blocks.
+
+    Args:
+        text: Markdown content of a post
+
+    Returns:
+        Counter: Term frequencies
+    """
+    text = CODE_BLOCK_RE.sub(' ', text.lower())
+    return Counter(
+        term for term in TOKEN_RE.findall(text) if term not in STOP_WORDS and len(term) <= MAX_TERM_LENGTH
+    )
+
+def chunks(items, size=CHUNK_SIZE):
+    """
+    Splits a collection into lists of at most ``size`` items.
+    """
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def load_corpus():
+    """
+    Streams published posts and their categories into memory-light structures.
+
+    Returns:
+        tuple: Dict of post id -> term Counter, and dict of post id -> category id set
+    """
+    terms = {}
+    for pk, content in Post.objects.filter(status=1).values_list('id', 'content').iterator():
+        terms[pk] = tokenize(content)
+    categories = defaultdict(set)
+    links = Post.categories.through.objects.filter(post__status=1).values_list('post_id', 'category_id')
+    for post_id, category_id in links.iterator():
+        categories[post_id].add(category_id)
+    return terms, categories
+
+def vectorize(counts, document_frequency, total):
+    """
+    Converts one post's term counts into an L2-normalized TF-IDF vector.
+
+    Args:
+        counts: Term -> occurrences in the post
+        document_frequency: Term -> number of published posts containing it
+        total: Number of published posts
+
+    Returns:
+        dict: Term -> weight
+    """
+    vector = {
+        term: (1 + math.log(count)) * math.log((1 + total) / (1 + document_frequency.get(term, 0)))
+        for term, count in counts.items()
+    }
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if not norm:
+        return {}
+    return {term: weight / norm for term, weight in vector.items() if weight}
+
+def build_vectors(terms):
+    """
+    Converts term counts into L2-normalized TF-IDF vectors.
+
+    Args:
+        terms: Dict of post id -> term Counter
+
+    Returns:
+        tuple: Dict of post id -> {term: weight}, and inverted index term -> [(post id, weight)]
+    """
+    document_frequency = Counter()
+    for counts in terms.values():
+        document_frequency.update(counts.keys())
+    total = len(terms)
+    vectors = {}
+    postings = defaultdict(list)
+    for pk, counts in terms.items():
+        vector = vectorize(counts, document_frequency, total)
+        vectors[pk] = vector
+        for term, weight in vector.items():
+            postings[term].append((pk, weight))
+    return vectors, postings
+
+def combined_score(own_categories, other_categories, cosine):
+    """
+    Combines category overlap and content similarity into one score.
+
+    Args:
+        own_categories: Category ids of the post
+        other_categories: Category ids of the other post
+        cosine: Cosine similarity of their TF-IDF vectors
+
+    Returns:
+        float: Weighted score
+    """
+    union = len(own_categories | other_categories)
+    jaccard = len(own_categories & other_categories) / union if union else 0.0
+    return CATEGORY_WEIGHT * jaccard + CONTENT_WEIGHT * cosine
+
+def score_post(pk, vectors, postings, categories, category_members):
+    """
+    Scores every post that shares a term or category with the given post.
+
+    Args:
+        pk: Post id to score against
+        vectors: Dict of post id -> normalized TF-IDF vector
+        postings: Inverted index term -> [(post id, weight)]
+        categories: Dict of post id -> category id set
+        category_members: Inverted index category id -> set of post ids
+
+    Returns:
+        dict: Other post id -> combined similarity score
+    """
+    cosine = defaultdict(float)
+    for term, weight in vectors.get(pk, {}).items():
+        for other, other_weight in postings[term]:
+            cosine[other] += weight * other_weight
+
+    own_categories = categories.get(pk, set())
+    candidates = set(cosine)
+    for category_id in own_categories:
+        candidates |= category_members[category_id]
+
+    scores = {}
+    for other in candidates:
+        if other == pk:
+            continue
+        score = combined_score(own_categories, categories.get(other, set()), cosine[other])
+        if score > 0:
+            scores[other] = score
+    return scores
+
+def top_related(scores, count=RELATED_POSTS_COUNT):
+    """
+    Picks the highest scoring posts, breaking ties by newest id.
+
+    Args:
+        scores: Dict of post id -> score
+        count: Number of entries to keep
+
+    Returns:
+        list: ``(post id, score)`` pairs, best first
+    """
+    return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:count]
+
+def prepare(terms, categories):
+    """
+    Builds the structures needed for scoring a whole corpus.
+
+    Args:
+        terms: Dict of post id -> term Counter
+        categories: Dict of post id -> category id set
+
+    Returns:
+        tuple: Vectors, postings, categories and category members
+    """
+    vectors, postings = build_vectors(terms)
+    category_members = defaultdict(set)
+    for post_id, category_ids in categories.items():
+        for category_id in category_ids:
+            category_members[category_id].add(post_id)
+    return vectors, postings, categories, category_members
+
+def rebuild_index(batch_size=1000):
+    """
+    Recomputes related posts and the stored term index for every published post.
+
+    Args:
+        batch_size: Rows per bulk insert
+
+    Returns:
+        int: Number of posts indexed
+    """
+    terms, categories = load_corpus()
+    vectors, postings, categories, category_members = prepare(terms, categories)
+    rows = []
+    for pk in vectors:
+        scores = score_post(pk, vectors, postings, categories, category_members)
+        rows.extend(
+            RelatedPost(post_id=pk, related_id=other, score=score)
+            for other, score in top_related(scores)
+        )
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        RelatedPost.objects.bulk_create(rows, batch_size=batch_size)
+        PostTerms.objects.all().delete()
+        TermPosting.objects.all().delete()
+        store_terms(terms, batch_size)
+    return len(vectors)
+
+def store_terms(terms, batch_size=1000):
+    """
+    Inserts term counts and postings for posts that have none stored.
+
+    Args:
+        terms: Dict of post id -> term Counter
+        batch_size: Rows per bulk insert
+    """
+    PostTerms.objects.bulk_create(
+        [PostTerms(post_id=pk, counts=dict(counts)) for pk, counts in terms.items()], batch_size=batch_size
+    )
+    TermPosting.objects.bulk_create(
+        (TermPosting(term=term, post_id=pk) for pk, counts in terms.items() for term in counts),
+        batch_size=batch_size,
+    )
+
+def save_terms(post_ids):
+    """
+    Re-tokenizes changed posts and replaces their stored terms and postings.
+
+    Posts that are no longer published lose their terms.
+
+    Args:
+        post_ids: Ids of the changed posts
+
+    Returns:
+        dict: Post id -> term Counter, for the published posts only
+    """
+    rows = Post.objects.filter(pk__in=post_ids, status=1).values_list('id', 'content')
+    terms = {pk: tokenize(content) for pk, content in rows}
+    with transaction.atomic():
+        PostTerms.objects.filter(post_id__in=post_ids).delete()
+        TermPosting.objects.filter(post_id__in=post_ids).delete()
+        store_terms(terms)
+    return terms
+
+def load_categories(post_ids):
+    """
+    Returns the category ids of some posts.
+
+    Args:
+        post_ids: Post ids
+
+    Returns:
+        dict: Post id -> category id set
+    """
+    categories = defaultdict(set)
+    for batch in chunks(post_ids):
+        links = Post.categories.through.objects.filter(post_id__in=batch).values_list('post_id', 'category_id')
+        for post_id, category_id in links:
+            categories[post_id].add(category_id)
+    return categories
+
+class TermStatistics:
+    """
+    Document frequencies read from the stored postings, cached for one batch.
+
+    Args:
+        total: Number of published posts
+    """
+    def __init__(self, total):
+        self.total = total
+        self.document_frequency = {}
+
+    def frequencies(self, terms):
+        """
+        Returns the document frequencies, fetching the terms not seen yet.
+
+        Args:
+            terms: Terms that will be looked up
+
+        Returns:
+            dict: Term -> number of published posts containing it
+        """
+        missing = [term for term in terms if term not in self.document_frequency]
+        for batch in chunks(missing):
+            self.document_frequency.update(dict.fromkeys(batch, 0))
+            rows = TermPosting.objects.filter(term__in=batch).values_list('term').annotate(count=Count('id'))
+            self.document_frequency.update(rows)
+        return self.document_frequency
+
+    def vectorize(self, counts):
+        return vectorize(counts, self.frequencies(counts), self.total)
+
+def score_changed_post(pk, counts, statistics):
+    """
+    Scores a changed post against the posts sharing its top terms or a category.
+
+    Args:
+        pk: Id of the changed (published) post
+        counts: Its term counts
+        statistics: TermStatistics of the current corpus
+
+    Returns:
+        dict: Other post id -> combined similarity score
+    """
+    vector = statistics.vectorize(counts)
+    query_terms = sorted(vector, key=lambda term: (-vector[term], term))[:QUERY_TERMS]
+    own_categories = load_categories([pk])[pk]
+
+    candidates = set(TermPosting.objects.filter(term__in=query_terms).values_list('post_id', flat=True))
+    candidates |= set(
+        Post.categories.through.objects.filter(category_id__in=own_categories, post__status=1)
+        .values_list('post_id', flat=True)
+    )
+    candidates.discard(pk)
+
+    candidate_terms = {}
+    for batch in chunks(candidates):
+        candidate_terms.update(PostTerms.objects.filter(post_id__in=batch).values_list('post_id', 'counts'))
+    categories = load_categories(candidate_terms)
+
+    scores = {}
+    for other, other_counts in candidate_terms.items():
+        other_vector = statistics.vectorize(other_counts)
+        cosine = sum(weight * other_vector.get(term, 0.0) for term, weight in vector.items())
+        score = combined_score(own_categories, categories.get(other, set()), cosine)
+        if score > 0:
+            scores[other] = score
+    return scores
+
+def update_posts(post_ids):
+    """
+    Incrementally refreshes the index after posts are published, edited or hidden.
+
+    Stores the changed posts' terms, recomputes their own related lists, then
+    patches the lists of other posts whose top entries should now include,
+    drop or re-rank them. Document frequencies are shared by the whole batch.
+
+    Args:
+        post_ids: Primary keys of the changed posts
+    """
+    post_ids = sorted(set(post_ids))
+    if not PostTerms.objects.exists():
+        # The term index was never built (e.g. right after upgrading)
+        rebuild_index()
+        return
+    terms = save_terms(post_ids)
+    statistics = TermStatistics(PostTerms.objects.count())
+    scores = {
+        pk: score_changed_post(pk, terms[pk], statistics) if pk in terms else {}
+        for pk in post_ids
+    }
+    patch_index(scores)
+
+def patch_index(scores):
+    """
+    Writes new related lists for changed posts and the posts they affect.
+
+    Args:
+        scores: Changed post id -> {other post id: score}; empty for posts
+            that are no longer published
+    """
+    changed = set(scores)
+    affected = set().union(*scores.values())
+    for batch in chunks(changed):
+        affected.update(RelatedPost.objects.filter(related_id__in=batch).values_list('post_id', flat=True))
+    affected -= changed
+
+    current = defaultdict(dict)
+    for batch in chunks(affected):
+        rows = RelatedPost.objects.filter(post_id__in=batch).values_list('post_id', 'related_id', 'score')
+        for post_id, related_id, score in rows:
+            current[post_id][related_id] = score
+
+    rows = [
+        RelatedPost(post_id=pk, related_id=other, score=score)
+        for pk, post_scores in scores.items()
+        for other, score in top_related(post_scores)
+    ]
+    rewritten = list(changed)
+    for post_id in affected:
+        entries = dict(current[post_id])
+        for pk, post_scores in scores.items():
+            entries.pop(pk, None)
+            if post_id in post_scores:
+                entries[pk] = post_scores[post_id]
+        best = top_related(entries)
+        if best != top_related(current[post_id]):
+            rewritten.append(post_id)
+            rows.extend(RelatedPost(post_id=post_id, related_id=other, score=score) for other, score in best)
+
+    with transaction.atomic():
+        for batch in chunks(rewritten):
+            RelatedPost.objects.filter(post_id__in=batch).delete()
+        RelatedPost.objects.bulk_create(rows, batch_size=CHUNK_SIZE)
+
+def get_related_posts(post):
+    """
+    Returns the precomputed related posts for display on the detail page.
+
+    Args:
+        post: The post being viewed
+
+    Returns:
+        QuerySet: Published related posts, most similar first
+    """
+    return (
+        Post.objects.filter(status=1, related_from__post=post)
+        .order_by('-related_from__score')
+    )
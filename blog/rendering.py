@@ -0,0 +1,317 @@
+"""
+Blog Rendering - Markdown to HTML conversion for posts
+=============================================
+This module is the single entry point the blog uses to turn post Markdown
+into sanitized HTML, following the ``MARKDOWNIFY`` settings.
+
+``markdown``, the ``codehilite`` Pygments lexers and ``bleach`` together take
+well over 100ms to import, so they are only imported the first time something
+is actually rendered. Worker processes that only serve the API, sitemaps or
+the admin never pay for them.
+
+Rendered HTML is cached by a hash of the source text through
+``blog.caching``, so a post is rendered once per edit rather than once per
+view, and concurrent first views of a post render it only once.
+
+Limits protect the web workers from pathological posts (huge tables,
+enormous code blocks, deeply nested lists):
+- Sources longer than ``MARKDOWN_MAX_INPUT_SIZE`` characters are not parsed
+- With ``MARKDOWN_RENDER_POOL_SIZE`` > 0, rendering runs in a pool of
+  separate processes and is abandoned after ``MARKDOWN_RENDER_TIMEOUT``
+  seconds; the stuck pool is terminated and replaced. Pool processes are
+  started with ``spawn``, since forking a threaded web worker can copy
+  locks held by other threads into the child. Starting the pool is waited
+  for before a render's clock starts, so it never counts as render time
+In both cases the post is shown as escaped plain text instead. Fallbacks
+caused by a timeout or an error are only cached for
+``MARKDOWN_FALLBACK_CACHE_TIMEOUT`` seconds so the post is retried later.
+
+Render durations are logged per post (slow ones as warnings) and the
+``post_changed`` job stores each post's last render time on
+``Post.render_time``.
+"""
+
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .caching import CACHE_STALE_TIMEOUT, get_or_compute, remember
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_CACHE_TIMEOUT = getattr(settings, 'MARKDOWN_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+MARKDOWN_FALLBACK_CACHE_TIMEOUT = getattr(settings, 'MARKDOWN_FALLBACK_CACHE_TIMEOUT', 60 * 5)
+MARKDOWN_MAX_INPUT_SIZE = getattr(settings, 'MARKDOWN_MAX_INPUT_SIZE', 200000)
+MARKDOWN_RENDER_POOL_SIZE = getattr(settings, 'MARKDOWN_RENDER_POOL_SIZE', 0)
+MARKDOWN_RENDER_TIMEOUT = getattr(settings, 'MARKDOWN_RENDER_TIMEOUT', 2.0)
+MARKDOWN_RENDER_POOL_START_TIMEOUT = getattr(settings, 'MARKDOWN_RENDER_POOL_START_TIMEOUT', 30.0)
+MARKDOWN_SLOW_RENDER = getattr(settings, 'MARKDOWN_SLOW_RENDER', 0.5)
+# Part of every cache key, so changing the MARKDOWNIFY settings re-renders posts
+SETTINGS_DIGEST = hashlib.sha1(repr(getattr(settings, 'MARKDOWNIFY', {})).encode()).hexdigest()[:8]
+
+# Outcomes of a limited render
+RENDERED = 'rendered'
+TOO_LARGE = 'too_large'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+_markdownify = None
+_pool = None
+_pool_lock = threading.Lock()
+
+def cache_key(text, custom_settings='default'):
+    """
+    Returns the cache key of the rendered HTML for a Markdown source.
+
+    Args:
+        text: Markdown source
+        custom_settings: Name of the ``MARKDOWNIFY`` settings profile
+
+    Returns:
+        str: Cache key
+    """
+    digest = hashlib.sha1(text.encode()).hexdigest()
+    return 'markdown:%s:%s:%s' % (custom_settings, SETTINGS_DIGEST, digest)
+
+def render_markdown(text, custom_settings='default', label=None):
+    """
+    Converts Markdown to sanitized HTML, using the cache when possible.
+
+    Args:
+        text: Markdown source
+        custom_settings: Name of the ``MARKDOWNIFY`` settings profile to use
+        label: What is rendered, such as ``'post 42'``, for log lines
+
+    Returns:
+        SafeString: Rendered HTML, or escaped plain text if rendering failed
+    """
+    text = text or ''
+    outcome = {}
+
+    def compute():
+        html, outcome['status'], _ = convert_limited(text, custom_settings, label)
+        return html
+
+    key = cache_key(text, custom_settings)
+    html = get_or_compute(key, compute, MARKDOWN_CACHE_TIMEOUT)
+    if outcome.get('status') in (TIMEOUT, ERROR):
+        store(key, html, MARKDOWN_FALLBACK_CACHE_TIMEOUT)
+    return html
+
+def render_markdown_timed(text, custom_settings='default', label=None):
+    """
+    Renders Markdown without reading the cache and reports how it went.
+
+    The result is stored in the cache, so the next page view does not
+    render the same source again.
+
+    Args:
+        text: Markdown source
+        custom_settings: Name of the ``MARKDOWNIFY`` settings profile to use
+        label: What is rendered, such as ``'post 42'``, for log lines
+
+    Returns:
+        tuple: HTML, outcome (``RENDERED``, ``TOO_LARGE``, ``TIMEOUT`` or
+            ``ERROR``) and duration in seconds
+    """
+    text = text or ''
+    html, status, duration = convert_limited(text, custom_settings, label)
+    timeout = MARKDOWN_FALLBACK_CACHE_TIMEOUT if status in (TIMEOUT, ERROR) else MARKDOWN_CACHE_TIMEOUT
+    store(cache_key(text, custom_settings), html, timeout)
+    return html, status, duration
+
+def store(key, html, timeout):
+    """
+    Caches rendered HTML for ``timeout`` seconds.
+
+    Args:
+        key: Cache key from ``cache_key()``
+        html: Rendered HTML
+        timeout: Seconds the HTML stays fresh
+    """
+    remember(key, html, time.time() + timeout, timeout, CACHE_STALE_TIMEOUT)
+
+def fallback(text):
+    """
+    Returns Markdown source as escaped, preformatted plain text.
+
+    Args:
+        text: Markdown source
+
+    Returns:
+        SafeString: HTML showing the source verbatim
+    """
+    return format_html('<pre class="markdown-fallback">{}</pre>', text)
+
+def convert_limited(text, custom_settings='default', label=None):
+    """
+    Converts Markdown to sanitized HTML within the size and time limits.
+
+    Args:
+        text: Markdown source
+        custom_settings: Name of the ``MARKDOWNIFY`` settings profile to use
+        label: What is rendered, for log lines; defaults to a hash of the source
+
+    Returns:
+        tuple: HTML, outcome and duration in seconds
+    """
+    label = label or 'markdown %s' % hashlib.sha1(text.encode()).hexdigest()[:12]
+    if len(text) > MARKDOWN_MAX_INPUT_SIZE:
+        logger.warning(
+            'Not rendering %s: %d characters of Markdown (limit %d)', label, len(text), MARKDOWN_MAX_INPUT_SIZE
+        )
+        return fallback(text), TOO_LARGE, 0.0
+
+    started = time.monotonic()
+    try:
+        if MARKDOWN_RENDER_POOL_SIZE > 0:
+            # Starting the pool is not part of the render, neither for its
+            # duration nor for its timeout
+            get_pool()
+            started = time.monotonic()
+            html = convert_in_pool(text, custom_settings)
+        else:
+            html = convert(text, custom_settings)
+    except multiprocessing.TimeoutError:
+        duration = time.monotonic() - started
+        logger.warning('Rendering %s timed out after %.1fs (%d characters)', label, duration, len(text))
+        return fallback(text), TIMEOUT, duration
+    except Exception:
+        duration = time.monotonic() - started
+        logger.exception('Rendering %s failed (%d characters)', label, len(text))
+        return fallback(text), ERROR, duration
+
+    duration = time.monotonic() - started
+    if duration >= MARKDOWN_SLOW_RENDER:
+        logger.warning('Slow Markdown render of %s: %.0f ms for %d characters', label, duration * 1000, len(text))
+    else:
+        logger.debug('Rendered %s (%d characters) in %.1f ms', label, len(text), duration * 1000)
+    return html, RENDERED, duration
+
+def convert(text, custom_settings='default'):
+    """
+    Converts Markdown to sanitized HTML without caching or limits.
+
+    The conversion is delegated to django-markdownify, which is imported on
+    the first call rather than at startup.
+
+    Args:
+        text: Markdown source
+        custom_settings: Name of the ``MARKDOWNIFY`` settings profile to use
+
+    Returns:
+        SafeString: Rendered HTML
+    """
+    global _markdownify
+    if _markdownify is None:
+        from markdownify.templatetags.markdownify import markdownify
+        _markdownify = markdownify
+    return _markdownify(text, custom_settings=custom_settings)
+
+def init_worker(ready):
+    """
+    Prepares a render pool process.
+
+    Pool processes are spawned fresh, so Django is set up from the
+    DJANGO_SETTINGS_MODULE inherited from the web worker, and the Markdown
+    stack is imported by an empty render, so the first post a process
+    renders is not charged for it.
+
+    Args:
+        ready: Semaphore released once the process can render
+    """
+    import django
+    django.setup()
+    convert('')
+    ready.release()
+
+def convert_in_worker(text, custom_settings):
+    """
+    Pool entry point: renders Markdown and returns plain, picklable HTML.
+    """
+    return str(convert(text, custom_settings))
+
+def get_pool():
+    """
+    Returns the render pool, starting it on first use.
+
+    A new pool is only returned once its processes are ready to render, or
+    after ``MARKDOWN_RENDER_POOL_START_TIMEOUT`` seconds if they are not.
+
+    Returns:
+        multiprocessing.pool.Pool: Pool of ``MARKDOWN_RENDER_POOL_SIZE`` processes
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context('spawn')
+            ready = context.Semaphore(0)
+            _pool = context.Pool(MARKDOWN_RENDER_POOL_SIZE, initializer=init_worker, initargs=(ready,))
+            deadline = time.monotonic() + MARKDOWN_RENDER_POOL_START_TIMEOUT
+            for _ in range(MARKDOWN_RENDER_POOL_SIZE):
+                if not ready.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                    logger.warning(
+                        'Render pool not ready after %.0fs, rendering anyway', MARKDOWN_RENDER_POOL_START_TIMEOUT
+                    )
+                    break
+        return _pool
+
+def reset_pool(pool):
+    """
+    Terminates a pool whose process is stuck so the next render starts a new one.
+
+    Renders still running in the terminated pool time out and fall back too.
+
+    Args:
+        pool: The pool a render timed out in
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.terminate()
+
+def shutdown_pool():
+    """
+    Terminates the current render pool, if one was started.
+
+    Registered with ``atexit``, so a worker process does not leave its pool
+    processes behind.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.terminate()
+
+atexit.register(shutdown_pool)
+
+def convert_in_pool(text, custom_settings='default'):
+    """
+    Converts Markdown in the render pool, waiting at most ``MARKDOWN_RENDER_TIMEOUT``.
+
+    Args:
+        text: Markdown source
+        custom_settings: Name of the ``MARKDOWNIFY`` settings profile to use
+
+    Returns:
+        SafeString: Rendered HTML
+
+    Raises:
+        multiprocessing.TimeoutError: If the render took too long
+    """
+    pool = get_pool()
+    result = pool.apply_async(convert_in_worker, (text, custom_settings))
+    try:
+        html = result.get(MARKDOWN_RENDER_TIMEOUT)
+    except multiprocessing.TimeoutError:
+        reset_pool(pool)
+        raise
+    return mark_safe(html)
@@ -0,0 +1,166 @@
+"""
+Blog Signals - Reacts to changes in blog content
+=============================================
+This module connects model signal handlers that keep derived data, such as
+cached sitemap chunks, cached sidebar data, the in-memory post index used by
+listing pages and the related-posts index, in sync with posts and categories.
+They also purge the affected pages from a reverse-proxy cache by surrogate
+key (see ``blog.purge``).
+
+Cheap cache invalidations happen right away. Slow work (rendering, the
+related-posts index, purge requests) is queued as background jobs (see
+``blog.jobs`` and ``blog.tasks``) so saving in the admin stays fast.
+It is imported from ``BlogConfig.ready()`` so the handlers are registered once.
+"""
+
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+
+from .models import Post, Category, Comment
+from . import sitemaps, caching, purge, postindex
+from .tasks import queue_post_changed
+
+def post_purge_keys(post):
+    """
+    Returns the surrogate keys of every page that shows a post.
+
+    Args:
+        post: The changed post
+
+    Returns:
+        list: Surrogate keys
+    """
+    keys = [purge.post_key(post.pk), purge.POST_LIST_KEY] + purge.archive_keys(post.created_on)
+    if post.pk is not None:
+        keys += [purge.category_key(slug) for slug in post.categories.values_list('slug', flat=True)]
+    return keys
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached category list and sitemap chunks when a category changes.
+
+    Args:
+        sender: The Category model class
+        instance: The saved or deleted category
+        **kwargs: Additional signal arguments
+    """
+    sitemaps.bump_categories_version()
+    caching.invalidate(caching.CATEGORIES_CACHE_KEY)
+    postindex.invalidate()
+    purge.purge([purge.category_key(instance.slug), purge.SIDEBAR_KEY])
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    """
+    Remembers the stored status, title and date of a post about to be saved.
+
+    ``post_saved`` uses them to purge the pages the post appeared on before
+    the change and to decide whether the sidebar is affected.
+
+    Args:
+        sender: The Post model class
+        instance: The post being saved
+        raw: True when loading fixtures, in which case nothing is done
+        **kwargs: Additional signal arguments
+    """
+    if raw or instance.pk is None:
+        instance._purge_previous = None
+        return
+    instance._purge_previous = (
+        Post.objects.filter(pk=instance.pk).values_list('status', 'title', 'created_on').first()
+    )
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """
+    Refreshes the cached archive list when a post is deleted.
+
+    Args:
+        sender: The Post model class
+        instance: The deleted post
+        **kwargs: Additional signal arguments
+    """
+    caching.invalidate(caching.ARCHIVES_CACHE_KEY)
+    postindex.refresh_posts([instance.pk])
+    purge.purge(post_purge_keys(instance) + [purge.SIDEBAR_KEY])
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, raw=False, **kwargs):
+    """
+    Refreshes the archive list and queues the post's background work when it is published or edited.
+
+    Args:
+        sender: The Post model class
+        instance: The saved post
+        raw: True when loading fixtures, in which case nothing is done
+        **kwargs: Additional signal arguments
+    """
+    caching.invalidate(caching.ARCHIVES_CACHE_KEY)
+    if raw:
+        return
+    postindex.refresh_posts([instance.pk])
+    queue_post_changed(instance.pk)
+
+    keys = post_purge_keys(instance)
+    previous = getattr(instance, '_purge_previous', None)
+    if previous is None or previous[:2] != (instance.status, instance.title):
+        # New, (un)published or renamed posts show up in the sidebar lists
+        keys.append(purge.SIDEBAR_KEY)
+    if previous is not None and previous[2] != instance.created_on:
+        keys += purge.archive_keys(previous[2])
+    purge.purge(keys)
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def post_categories_changed(sender, instance, action, reverse, **kwargs):
+    """
+    Queues the post's background work when its categories change.
+
+    Args:
+        sender: The Post-Category through model
+        instance: The post (or category, for reverse changes)
+        action: The m2m change being signalled
+        reverse: True when the change was made from the category side
+        **kwargs: Additional signal arguments
+    """
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        postindex.refresh_posts([instance.pk])
+        queue_post_changed(instance.pk)
+        # The removed categories are gone from the post, so purge them by pk
+        slugs = Category.objects.filter(pk__in=kwargs.get('pk_set') or ()).values_list('slug', flat=True)
+        purge.purge(post_purge_keys(instance) + [purge.category_key(slug) for slug in slugs])
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    """
+    Drops the post index when a user is saved, since listing pages show author names.
+
+    Saves that only record a login are ignored.
+
+    Args:
+        sender: The User model class
+        instance: The saved user
+        update_fields: Fields passed to ``save()``, if any
+        **kwargs: Additional signal arguments
+    """
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    postindex.invalidate()
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    """
+    Purges a post's pages when one of its approved comments changes.
+
+    Unapproved comments are not shown anywhere, so saving them purges nothing.
+
+    Args:
+        sender: The Comment model class
+        instance: The saved or deleted comment
+        **kwargs: Additional signal arguments
+    """
+    if instance.approved:
+        purge.purge([purge.post_key(instance.post_id)])
@@ -0,0 +1,209 @@
+"""
+Blog Sitemaps - Chunked sitemap generation for search engines
+=============================================
+This module builds the XML served at ``/sitemap.xml``: a sitemap index that
+points to numbered chunks for posts, categories and archive months.
+
+Each chunk is generated by streaming plain rows with ``values_list().iterator()``
+instead of loading model instances, and the rendered XML is cached under a key
+that includes a cheap fingerprint of the rows it covers. When a post or category
+in a chunk changes, the fingerprint changes and the chunk is rebuilt; untouched
+chunks keep being served from the cache.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncMonth
+from django.urls import reverse
+from django.utils.html import escape
+
+from .models import Post, Category
+
+SITEMAP_CHUNK_SIZE = getattr(settings, 'SITEMAP_CHUNK_SIZE', 5000)
+SITEMAP_CACHE_TIMEOUT = getattr(settings, 'SITEMAP_CACHE_TIMEOUT', 60 * 60 * 24)
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+SECTIONS = ('posts', 'categories', 'archives')
+
+def published_posts():
+    """
+    Returns the published posts in a stable order for chunking.
+
+    Returns:
+        QuerySet: Published posts ordered by primary key
+    """
+    return Post.objects.filter(status=1).order_by('pk')
+
+def archive_months():
+    """
+    Returns one row per month with published posts and its latest update.
+
+    Returns:
+        QuerySet: Rows of ``{'month': datetime, 'lastmod': datetime}``, newest first
+    """
+    return (
+        Post.objects.filter(status=1)
+        .annotate(month=TruncMonth('created_on'))
+        .values('month')
+        .annotate(lastmod=Max('updated_on'))
+        .order_by('-month')
+    )
+
+def category_rows():
+    """
+    Returns categories with the latest update of their published posts.
+
+    Returns:
+        QuerySet: Categories ordered by primary key, annotated with ``lastmod``
+    """
+    return Category.objects.order_by('pk').annotate(
+        lastmod=Max('posts__updated_on', filter=Q(posts__status=1))
+    )
+
+def section_count(section):
+    """
+    Counts the rows covered by a sitemap section.
+
+    Args:
+        section: One of 'posts', 'categories' or 'archives'
+
+    Returns:
+        int: Number of URLs in the section
+    """
+    if section == 'posts':
+        return published_posts().count()
+    if section == 'categories':
+        return Category.objects.count()
+    return archive_months().count()
+
+def chunk_count(section):
+    """
+    Returns how many chunks a section is split into.
+
+    Args:
+        section: One of 'posts', 'categories' or 'archives'
+
+    Returns:
+        int: Number of chunks (zero when the section is empty)
+    """
+    count = section_count(section)
+    return (count + SITEMAP_CHUNK_SIZE - 1) // SITEMAP_CHUNK_SIZE
+
+def chunk_fingerprint(section, chunk):
+    """
+    Computes a cheap summary of the rows in a chunk for use in its cache key.
+
+    The summary only uses aggregate queries, so it changes whenever a row in
+    the chunk is added, removed or saved without reading the rows themselves.
+
+    Args:
+        section: One of 'posts', 'categories' or 'archives'
+        chunk: Zero-based chunk number
+
+    Returns:
+        str: Hex digest identifying the current state of the chunk
+    """
+    start = chunk * SITEMAP_CHUNK_SIZE
+    end = start + SITEMAP_CHUNK_SIZE
+    if section == 'posts':
+        summary = published_posts()[start:end].aggregate(
+            count=Count('pk'), last_pk=Max('pk'), lastmod=Max('updated_on')
+        )
+    else:
+        # Category and month rows derive their lastmod from posts, so any
+        # published post change may affect them
+        summary = Post.objects.filter(status=1).aggregate(
+            count=Count('pk'), last_pk=Max('pk'), lastmod=Max('updated_on')
+        )
+        if section == 'categories':
+            summary['categories'] = Category.objects.order_by('pk')[start:end].aggregate(
+                count=Count('pk'), last_pk=Max('pk')
+            )
+            summary['version'] = cache.get('sitemap:categories:version', 0)
+    return hashlib.md5(repr(sorted(summary.items())).encode()).hexdigest()
+
+def iter_chunk_urls(section, chunk):
+    """
+    Streams the ``(path, lastmod)`` pairs for one chunk of a section.
+
+    Args:
+        section: One of 'posts', 'categories' or 'archives'
+        chunk: Zero-based chunk number
+
+    Yields:
+        tuple: URL path and last modification datetime (or None)
+    """
+    start = chunk * SITEMAP_CHUNK_SIZE
+    end = start + SITEMAP_CHUNK_SIZE
+    if section == 'posts':
+        rows = published_posts()[start:end].values_list('slug', 'updated_on')
+        for slug, updated_on in rows.iterator():
+            yield reverse('blog:post_detail', args=[slug]), updated_on
+    elif section == 'categories':
+        rows = category_rows()[start:end].values_list('slug', 'lastmod')
+        for slug, lastmod in rows.iterator():
+            yield reverse('blog:category', args=[slug]), lastmod
+    else:
+        for row in archive_months()[start:end].iterator():
+            month = row['month']
+            yield reverse('blog:archive_month', args=[month.year, month.month]), row['lastmod']
+
+def render_chunk(request, section, chunk):
+    """
+    Returns the XML for one sitemap chunk, served from the cache when unchanged.
+
+    Args:
+        request: HTTP request, used to build absolute URLs
+        section: One of 'posts', 'categories' or 'archives'
+        chunk: Zero-based chunk number
+
+    Returns:
+        str: The ``<urlset>`` document for the chunk
+    """
+    base = request.build_absolute_uri('/')[:-1]
+    key = 'sitemap:%s:%s:%s:%s' % (
+        section, chunk, hashlib.md5(base.encode()).hexdigest(), chunk_fingerprint(section, chunk)
+    )
+    xml = cache.get(key)
+    if xml is None:
+        parts = [XML_HEADER, '<urlset xmlns="%s">\n' % XMLNS]
+        for path, lastmod in iter_chunk_urls(section, chunk):
+            parts.append('<url><loc>%s</loc>' % escape(base + path))
+            if lastmod:
+                parts.append('<lastmod>%s</lastmod>' % lastmod.date().isoformat())
+            parts.append('</url>\n')
+        parts.append('</urlset>\n')
+        xml = ''.join(parts)
+        cache.set(key, xml, SITEMAP_CACHE_TIMEOUT)
+    return xml
+
+def render_index(request):
+    """
+    Returns the sitemap index listing every chunk of every section.
+
+    Args:
+        request: HTTP request, used to build absolute URLs
+
+    Returns:
+        str: The ``<sitemapindex>`` document
+    """
+    parts = [XML_HEADER, '<sitemapindex xmlns="%s">\n' % XMLNS]
+    for section in SECTIONS:
+        for chunk in range(chunk_count(section)):
+            path = reverse('blog:sitemap_section', args=[section, chunk + 1])
+            parts.append('<sitemap><loc>%s</loc></sitemap>\n' % escape(request.build_absolute_uri(path)))
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts)
+
+def bump_categories_version():
+    """
+    Invalidates cached category chunks after a category is renamed or removed.
+    """
+    try:
+        cache.incr('sitemap:categories:version')
+    except ValueError:
+        cache.set('sitemap:categories:version', 1, None)
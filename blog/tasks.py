@@ -0,0 +1,62 @@
+"""
+Blog Tasks - Background job handlers
+=============================================
+This module registers the handlers run by the ``run_jobs`` worker (see
+``blog.jobs``). Signal handlers in ``blog.signals`` queue them when posts,
+categories and comments change, so the admin request that saved the change
+only pays for a few INSERTs.
+
+Every handler receives the payloads of a whole batch of jobs and must be safe
+to run again for the same payload, since a failed batch is retried.
+
+It is imported from ``BlogConfig.ready()`` so the handlers are registered in
+every process that may run jobs.
+"""
+
+from . import outline, postindex, purge, related, rendering
+from .jobs import enqueue, task
+from .models import Post
+
+POST_CHANGED_TASK = 'post_changed'
+
+def queue_post_changed(post_id):
+    """
+    Queues a ``post_changed`` job, at most one per post at a time.
+
+    Args:
+        post_id: Primary key of the changed post
+    """
+    enqueue(POST_CHANGED_TASK, 'post:%s' % post_id, {'post_id': post_id})
+
+@task(POST_CHANGED_TASK)
+def post_changed(payloads):
+    """
+    Brings everything derived from a post's content up to date.
+
+    For each post: renders the Markdown (filling the rendering cache) and
+    stores the table of contents, reading time, excerpt and render duration.
+    Then refreshes the related-posts entries of the whole batch at once and
+    the posts' rows in the post index, and finally purges the pages showing
+    the new outline.
+
+    Args:
+        payloads: Dicts with a ``post_id`` key
+    """
+    post_ids = {payload['post_id'] for payload in payloads}
+    posts = list(Post.objects.filter(pk__in=post_ids).only('id', 'content'))
+    for post in posts:
+        html, status, duration = rendering.render_markdown_timed(post.content, label='post %d' % post.pk)
+        Post.objects.filter(pk=post.pk).update(render_time=duration, **outline.extract_outline(html))
+    related.update_posts(post_ids)
+    postindex.refresh_posts([post.pk for post in posts])
+    purge.purge([purge.POST_LIST_KEY] + [purge.post_key(post.pk) for post in posts])
+
+@task(purge.PURGE_TASK)
+def purge_keys(payloads):
+    """
+    Sends the surrogate keys of all queued purge jobs in merged batches.
+
+    Args:
+        payloads: Dicts with a ``keys`` list
+    """
+    purge.purge_now(key for payload in payloads for key in payload['keys'])
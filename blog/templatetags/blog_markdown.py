@@ -0,0 +1,33 @@
+"""
+Blog Markdown Template Tags
+=============================================
+Provides the ``markdownify`` filter used by the blog templates.
+
+It replaces the django-markdownify template library, whose module imports
+``markdown`` and ``bleach`` as soon as Django's template engine starts. This
+library only imports them when a post is first rendered.
+
+Usage:
+    {% load blog_markdown %}
+    {{ post.content|markdownify }}
+"""
+
+from django import template
+
+from blog.rendering import render_markdown
+
+register = template.Library()
+
+@register.filter
+def markdownify(text, custom_settings='default'):
+    """
+    Renders Markdown text as sanitized HTML.
+
+    Args:
+        text: Markdown source
+        custom_settings: Name of the ``MARKDOWNIFY`` settings profile to use
+
+    Returns:
+        SafeString: Rendered HTML
+    """
+    return render_markdown(text, custom_settings)
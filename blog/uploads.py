@@ -0,0 +1,220 @@
+"""
+Blog Uploads - Content-addressed storage for editor images
+=============================================
+This module replaces django-mdeditor's upload view. The original saves every
+upload under a new timestamped name, so an image uploaded twice is stored
+twice and browsers download it again under each name.
+
+Here an upload is named after the SHA-256 of its content:
+- ``HashingUploadHandler`` checks the field and the file extension first,
+  then streams the request body in chunks into a temporary file inside the
+  upload folder, hashing it on the way, so the image is never held in
+  memory and never copied; other files in the request are not written
+- The temporary file is then renamed to ``<hash>.<extension>``; if that file
+  already exists, the upload is a duplicate and the existing URL is
+  returned. Temporary files left over (duplicates, extra files, aborted
+  requests) are always removed
+- Since the content behind a hashed name never changes, the files should be
+  served with a far-future ``immutable`` Cache-Control header.
+  ``serve_upload`` does so under ``DEBUG``; in production the web server
+  serves ``MEDIA_ROOT`` and must be configured to send the same header
+
+Uploads go to ``MEDIA_ROOT/<image_folder>`` of the ``MDEDITOR_CONFIGS``
+default profile and are limited to its ``upload_image_formats``, as before.
+Only staff users may upload.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.views.static import serve
+from mdeditor.configs import MDConfig
+
+UPLOAD_CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 64 * 1024)
+UPLOAD_CACHE_MAX_AGE = getattr(settings, 'UPLOAD_CACHE_MAX_AGE', 60 * 60 * 24 * 365)
+# Hex digits of the SHA-256 kept in file names (128 bits)
+UPLOAD_HASH_LENGTH = 32
+
+UPLOAD_FIELD = 'editormd-image-file'
+EDITOR_CONFIG = MDConfig('default')
+IMAGE_FOLDER = EDITOR_CONFIG['image_folder']
+# Spellings of the same format share a name, so duplicates are found across them
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+# URL of the hashed uploads, served by serve_upload()
+UPLOAD_URL_PATTERN = r'^%s(?P<name>[0-9a-f]{%d}\.[a-z0-9]+)$' % (
+    re.escape('%s%s/' % (settings.MEDIA_URL.lstrip('/'), IMAGE_FOLDER)), UPLOAD_HASH_LENGTH
+)
+
+def upload_dir():
+    """
+    Returns the directory editor uploads are stored in.
+
+    Returns:
+        str: Absolute path inside MEDIA_ROOT
+    """
+    return os.path.join(settings.MEDIA_ROOT, IMAGE_FOLDER)
+
+def upload_extension(file_name):
+    """
+    Returns the normalized extension of an uploaded file, if it is allowed.
+
+    Args:
+        file_name: Name of the file on the author's computer
+
+    Returns:
+        str: Lower-case extension, or None if the format is not allowed
+    """
+    extension = os.path.splitext(file_name)[1][1:]
+    allowed = {allowed.lower() for allowed in EDITOR_CONFIG['upload_image_formats']}
+    if extension.lower() not in allowed:
+        return None
+    extension = extension.lower()
+    return EXTENSION_ALIASES.get(extension, extension)
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Writes editor images into the upload folder while computing their SHA-256.
+
+    Only files in the ``UPLOAD_FIELD`` field with an allowed extension are
+    written; anything else is skipped without being written, and the
+    name of a skipped image is kept in ``rejected``. The resulting
+    ``UploadedFile`` has ``sha256`` and ``extension`` attributes and a
+    ``temporary_file_path()`` pointing at the written file. Call
+    ``discard_files()`` once the request is handled to remove temporary
+    files that were not moved into place.
+    """
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.temporary_files = []
+        self.rejected = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        if field_name != UPLOAD_FIELD:
+            raise SkipFile()
+        self.extension = upload_extension(file_name)
+        if self.extension is None:
+            self.rejected = file_name
+            raise SkipFile()
+        super().new_file(field_name, file_name, *args, **kwargs)
+        os.makedirs(upload_dir(), exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=upload_dir(), prefix='.upload-', delete=False)
+        self.temporary_files.append(self.file)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        upload = UploadedFile(self.file, self.file_name, self.content_type, file_size, self.charset)
+        upload.sha256 = self.digest.hexdigest()
+        upload.extension = self.extension
+        upload.temporary_file_path = lambda path=self.file.name: path
+        return upload
+
+    def discard_files(self):
+        """
+        Closes and removes every temporary file still at its temporary path.
+        """
+        for file in self.temporary_files:
+            file.close()
+            discard(file.name)
+
+def discard(path):
+    """
+    Removes a temporary upload file that may already be gone.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def store_upload(upload):
+    """
+    Moves a hashed upload to its content-addressed name.
+
+    Args:
+        upload: File produced by ``HashingUploadHandler``
+
+    Returns:
+        tuple: File name inside the upload folder, and whether it was new
+    """
+    name = '%s.%s' % (upload.sha256[:UPLOAD_HASH_LENGTH], upload.extension)
+    path = os.path.join(upload_dir(), name)
+    if os.path.exists(path):
+        return name, False
+    os.replace(upload.temporary_file_path(), path)
+    os.chmod(path, 0o644)
+    return name, True
+
+def upload_result(success, message, url=''):
+    """
+    Returns a response in the format the editor's upload dialog expects.
+    """
+    return JsonResponse({'success': 1 if success else 0, 'message': message, 'url': url})
+
+@csrf_exempt
+@require_POST
+def upload_image(request):
+    """
+    View storing an image uploaded from the Markdown editor.
+
+    CSRF checks are skipped like in django-mdeditor's own view, because the
+    editor's upload form does not send a token; the check would also read
+    the body before the hashing upload handler is installed.
+
+    Args:
+        request: HTTP request with the image in ``editormd-image-file``
+
+    Returns:
+        JsonResponse: ``success``, ``message`` and the image ``url``
+    """
+    if not (request.user.is_active and request.user.is_staff):
+        return upload_result(False, 'Only staff users may upload images')
+
+    handler = HashingUploadHandler(request)
+    request.upload_handlers = [handler]
+    try:
+        upload = request.FILES.get(UPLOAD_FIELD)
+        if upload is None:
+            if handler.rejected:
+                return upload_result(False, 'Unsupported image format, allowed formats are: %s' % ', '.join(
+                    EDITOR_CONFIG['upload_image_formats']
+                ))
+            return upload_result(False, 'No image was uploaded')
+        name, _ = store_upload(upload)
+    finally:
+        # Duplicates, extra images and files of an aborted request
+        handler.discard_files()
+    return upload_result(True, 'Upload succeeded', '%s%s/%s' % (settings.MEDIA_URL, IMAGE_FOLDER, name))
+
+def serve_upload(request, name):
+    """
+    View serving a content-addressed upload with immutable cache headers.
+
+    Only routed under ``DEBUG``, like Django's other media serving; in
+    production the web server serves the upload folder.
+
+    Args:
+        request: HTTP request
+        name: Hashed file name from the URL
+
+    Returns:
+        FileResponse: The image, cacheable for ``UPLOAD_CACHE_MAX_AGE`` seconds
+    """
+    response = serve(request, name, document_root=upload_dir())
+    response['Cache-Control'] = 'public, max-age=%d, immutable' % UPLOAD_CACHE_MAX_AGE
+    return response
@@ -1,13 +1,21 @@
 from django.urls import path
-from . import views
+from . import views, api
 
 app_name = 'blog'
 
 urlpatterns = [
     path('', views.post_list, name='home'),
     path('post/<slug:slug>/', views.post_detail, name='post_detail'),
+    path('post/<slug:slug>/comments/', views.comment_fragment, name='post_comments'),
     path('category/<slug:slug>/', views.category_view, name='category'),
     path('archive/<int:year>/', views.archive_view, name='archive_year'),
     path('archive/<int:year>/<int:month>/', views.archive_view, name='archive_month'),
     path('about/', views.about, name='about'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap'),
+    path('sitemap-<slug:section>-<int:chunk>.xml', views.sitemap_section, name='sitemap_section'),
+    path('api/posts/', api.post_list, name='api_posts'),
+    path('api/posts/<slug:slug>/', api.post_detail, name='api_post_detail'),
+    path('api/posts/<slug:slug>/comments/', api.comment_list, name='api_comments'),
+    path('api/categories/', api.category_list, name='api_categories'),
+    path('api/archives/', api.archive_list, name='api_archives'),
 ] 
\ No newline at end of file
@@ -10,9 +10,11 @@ functions for shared functionality across views.
 """
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib import messages
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Post, Category, Comment
+from django.http import HttpResponse, HttpResponseBadRequest, Http404
+from .models import Post, Category
+from . import sitemaps, related, pageviews, caching, purge, postindex
+from .comments import submit_comment, get_comment_page
 import datetime
 
 def get_archives():
@@ -38,14 +40,22 @@ def get_archives():
 
 def get_common_context():
     """
-    Returns a dictionary with categories and archives for the sidebar.
+    Returns a dictionary with categories, archives and popular posts for the sidebar.
+    
+    Categories and archives are cached and refreshed when posts or categories
+    change (see blog.signals).
     
     Returns:
-        dict: Context containing categories and archives
+        dict: Context containing categories, archives and popular posts
     """
     context = {}
-    context['categories'] = Category.objects.all()
-    context['archives'] = get_archives()
+    context['categories'] = caching.get_or_compute(
+        caching.CATEGORIES_CACHE_KEY, lambda: list(Category.objects.all()), caching.SIDEBAR_CACHE_TIMEOUT
+    )
+    context['archives'] = caching.get_or_compute(
+        caching.ARCHIVES_CACHE_KEY, get_archives, caching.SIDEBAR_CACHE_TIMEOUT
+    )
+    context['popular_posts'] = pageviews.get_popular_posts()
     return context
 
 def post_list(request):
@@ -58,8 +68,8 @@ def post_list(request):
     Returns:
         HttpResponse: Rendered homepage with paginated posts and sidebar
     """
-    # Get published posts, newest first
-    post_list = Post.objects.filter(status=1).order_by('-created_on')
+    # Get published posts, newest first, from the in-memory post index
+    post_list = postindex.get_index().posts()
     
     # Set up pagination
     paginator = Paginator(post_list, 5)  # Show 5 posts per page
@@ -80,13 +90,17 @@ def post_list(request):
     }
     context.update(get_common_context())
     
-    return render(request, 'blog/home.html', context)
+    response = render(request, 'blog/home.html', context)
+    return purge.tag_response(
+        response, [purge.SIDEBAR_KEY, purge.POST_LIST_KEY] + [purge.post_key(post.pk) for post in posts]
+    )
 
 def post_detail(request, slug):
     """
     View for displaying a single blog post and handling comment submissions.
     
-    Displays a post with its details, comments, and a comment form.
+    Displays a post with its details, related posts, the first batch of
+    comments, and a comment form.
     Also handles the POST requests for comment submissions.
     
     Args:
@@ -97,37 +111,61 @@ def post_detail(request, slug):
         HttpResponse: Rendered post detail page or redirect after comment
     """
     # Get the post, ensuring it's published
-    post = get_object_or_404(Post.objects.filter(status=1), slug=slug)
+    post = get_object_or_404(
+        Post.objects.filter(status=1).select_related('author').prefetch_related('categories'), slug=slug
+    )
     
     # Handle comment submission if POST request
     if request.method == 'POST':
-        name = request.POST.get('name')
-        email = request.POST.get('email')
-        content = request.POST.get('content')
-        
-        if name and email and content:
-            Comment.objects.create(
-                post=post,
-                name=name,
-                email=email,
-                content=content
-            )
-            messages.success(request, 'Your comment has been submitted and is awaiting approval.')
-        else:
-            messages.error(request, 'Please fill in all the required fields.')
-        
+        submit_comment(request, post)
         return redirect(post.get_absolute_url())
     
-    # For GET requests, prepare and render the template
-    comments = post.comments.filter(approved=True).order_by('created_on')
+    # For GET requests, count the view and render the template
+    pageviews.record_view(request, post)
+    comments, comments_next = get_comment_page(post.pk)
     
     context = {
         'post': post,
+        'post_slug': post.slug,
         'comments': comments,
+        'comments_next': comments_next,
+        'related_posts': related.get_related_posts(post),
     }
     context.update(get_common_context())
     
-    return render(request, 'blog/post_detail.html', context)
+    response = render(request, 'blog/post_detail.html', context)
+    keys = [purge.SIDEBAR_KEY, purge.post_key(post.pk)] + purge.archive_keys(post.created_on)
+    keys += [purge.category_key(category.slug) for category in post.categories.all()]
+    return purge.tag_response(response, keys)
+
+def comment_fragment(request, slug):
+    """
+    View returning the next batch of approved comments as an HTML fragment.
+    
+    Used by main.js to load comments progressively below a post.
+    
+    Args:
+        request: HTTP request with an ``after`` cursor
+        slug: Post slug from URL
+        
+    Returns:
+        HttpResponse: Rendered comments and, if more remain, a "load more" link
+    """
+    post_id = Post.objects.filter(status=1, slug=slug).values_list('id', flat=True).first()
+    if post_id is None:
+        raise Http404("Post not found")
+    try:
+        comments, comments_next = get_comment_page(post_id, request.GET.get('after'))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor")
+    
+    context = {
+        'post_slug': slug,
+        'comments': comments,
+        'comments_next': comments_next,
+    }
+    response = render(request, 'blog/comment_list.html', context)
+    return purge.tag_response(response, [purge.post_key(post_id)])
 
 def category_view(request, slug):
     """
@@ -142,11 +180,12 @@ def category_view(request, slug):
     Returns:
         HttpResponse: Rendered category page with filtered posts
     """
-    # Get the category
-    category = get_object_or_404(Category, slug=slug)
-    
-    # Get published posts in this category
-    post_list = Post.objects.filter(categories=category, status=1).order_by('-created_on')
+    # Get the category and its published posts from the in-memory post index
+    index = postindex.get_index()
+    category = index.category(slug)
+    if category is None:
+        raise Http404("Category not found")
+    post_list = index.category_posts(category)
     
     # Set up pagination
     paginator = Paginator(post_list, 5)  # Show 5 posts per page
@@ -168,7 +207,9 @@ def category_view(request, slug):
     }
     context.update(get_common_context())
     
-    return render(request, 'blog/category.html', context)
+    response = render(request, 'blog/category.html', context)
+    keys = [purge.SIDEBAR_KEY, purge.POST_LIST_KEY, purge.category_key(category.slug)]
+    return purge.tag_response(response, keys + [purge.post_key(post.pk) for post in posts])
 
 def archive_view(request, year, month=None):
     """
@@ -187,23 +228,15 @@ def archive_view(request, year, month=None):
     # Convert string params to integers
     year = int(year)
     
-    # Filter posts by date
+    # Filter posts by date, using the in-memory post index
     if month:
         month = int(month)
         date = datetime.date(year=year, month=month, day=1)
-        post_list = Post.objects.filter(
-            created_on__year=year,
-            created_on__month=month,
-            status=1
-        ).order_by('-created_on')
         archive_title = date.strftime("%B %Y")  # Format like "June 2023"
     else:
         date = datetime.date(year=year, month=1, day=1)
-        post_list = Post.objects.filter(
-            created_on__year=year,
-            status=1
-        ).order_by('-created_on')
         archive_title = str(year)  # Just the year
+    post_list = postindex.get_index().archive_posts(year, month)
     
     # Set up pagination
     paginator = Paginator(post_list, 5)  # Show 5 posts per page
@@ -225,7 +258,10 @@ def archive_view(request, year, month=None):
     }
     context.update(get_common_context())
     
-    return render(request, 'blog/archive.html', context)
+    response = render(request, 'blog/archive.html', context)
+    archive_key = purge.archive_keys(date)[1 if month else 0]
+    keys = [purge.SIDEBAR_KEY, purge.POST_LIST_KEY, archive_key]
+    return purge.tag_response(response, keys + [purge.post_key(post.pk) for post in posts])
 
 def about(request):
     """
@@ -241,4 +277,34 @@ def about(request):
         HttpResponse: Rendered about page
     """
     context = get_common_context()
-    return render(request, 'blog/about.html', context)
+    response = render(request, 'blog/about.html', context)
+    return purge.tag_response(response, [purge.SIDEBAR_KEY])
+
+def sitemap_index(request):
+    """
+    View for the sitemap index pointing search engines to every sitemap chunk.
+    
+    Args:
+        request: HTTP request
+        
+    Returns:
+        HttpResponse: XML sitemap index
+    """
+    return HttpResponse(sitemaps.render_index(request), content_type='application/xml')
+
+def sitemap_section(request, section, chunk):
+    """
+    View for a single chunk of the posts, categories or archives sitemap.
+    
+    Args:
+        request: HTTP request
+        section: Sitemap section name from URL
+        chunk: One-based chunk number from URL
+        
+    Returns:
+        HttpResponse: XML urlset for the requested chunk
+    """
+    if section not in sitemaps.SECTIONS or not 1 <= chunk <= sitemaps.chunk_count(section):
+        raise Http404("Sitemap chunk does not exist")
+    xml = sitemaps.render_chunk(request, section, chunk - 1)
+    return HttpResponse(xml, content_type='application/xml')
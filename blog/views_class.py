@@ -9,10 +9,12 @@ The architecture follows Django's class-based views pattern with a custom mixin
 for shared functionality across views.
 """
 
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, redirect
 from django.views import generic
-from django.contrib import messages
-from .models import Post, Category, Comment
+from django.http import HttpResponse, HttpResponseBadRequest, Http404
+from .models import Post, Category
+from . import sitemaps, related, pageviews, caching, purge, postindex
+from .comments import submit_comment, get_comment_page
 import datetime
 
 class BlogContextMixin:
@@ -25,14 +27,22 @@ class BlogContextMixin:
     """
     def get_common_context(self):
         """
-        Returns a dictionary with categories and archives for the sidebar.
+        Returns a dictionary with categories, archives and popular posts for the sidebar.
+        
+        Categories and archives are cached and refreshed when posts or categories
+        change (see blog.signals).
         
         Returns:
-            dict: Context containing categories and archives
+            dict: Context containing categories, archives and popular posts
         """
         context = {}
-        context['categories'] = Category.objects.all()
-        context['archives'] = self.get_archives()
+        context['categories'] = caching.get_or_compute(
+            caching.CATEGORIES_CACHE_KEY, lambda: list(Category.objects.all()), caching.SIDEBAR_CACHE_TIMEOUT
+        )
+        context['archives'] = caching.get_or_compute(
+            caching.ARCHIVES_CACHE_KEY, self.get_archives, caching.SIDEBAR_CACHE_TIMEOUT
+        )
+        context['popular_posts'] = pageviews.get_popular_posts()
         return context
     
     def get_archives(self):
@@ -55,6 +65,32 @@ class BlogContextMixin:
             if date not in archives[year]:
                 archives[year].append(date)
         return archives
+    
+    def get_surrogate_keys(self, context):
+        """
+        Returns the surrogate keys describing what a page was built from.
+        
+        Views extend this with the posts, categories and archives they show
+        so a reverse proxy can purge exactly the stale pages (see blog.purge).
+        
+        Args:
+            context: Context the page was rendered with
+            
+        Returns:
+            list: Surrogate keys
+        """
+        keys = [purge.SIDEBAR_KEY]
+        if context.get('is_paginated') is not None:
+            keys.append(purge.POST_LIST_KEY)
+            keys += [purge.post_key(post.pk) for post in context['object_list']]
+        return keys
+    
+    def render_to_response(self, context, **response_kwargs):
+        """
+        Renders the page and tags it with its surrogate keys.
+        """
+        response = super().render_to_response(context, **response_kwargs)
+        return purge.tag_response(response, self.get_surrogate_keys(context))
 
 class PostList(BlogContextMixin, generic.ListView):
     """
@@ -63,11 +99,19 @@ class PostList(BlogContextMixin, generic.ListView):
     Inherits from BlogContextMixin to include sidebar data and
     Django's ListView for pagination and template rendering.
     """
-    queryset = Post.objects.filter(status=1).order_by('-created_on')  # Only published posts, newest first
     template_name = 'blog/home.html'
     paginate_by = 5  # Show 5 posts per page
     context_object_name = 'posts'  # Template variable name for the post list
     
+    def get_queryset(self):
+        """
+        Returns the published posts, newest first, from the in-memory post index.
+        
+        Returns:
+            PostList: Published posts
+        """
+        return postindex.get_index().posts()
+    
     def get_context_data(self, **kwargs):
         """
         Adds common sidebar context to the view's context.
@@ -100,24 +144,36 @@ class PostDetail(BlogContextMixin, generic.DetailView):
         Returns:
             QuerySet: Filtered queryset with only published posts
         """
-        return Post.objects.filter(status=1)
+        return Post.objects.filter(status=1).select_related('author').prefetch_related('categories')
     
     def get_context_data(self, **kwargs):
         """
-        Adds comments and sidebar data to the context.
+        Adds the first batch of comments, related posts and sidebar data to the context.
         
         Args:
             **kwargs: Default context from parent class
             
         Returns:
-            dict: Context with post, comments, and sidebar data
+            dict: Context with post, comments, related posts, and sidebar data
         """
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
-        context['comments'] = post.comments.filter(approved=True).order_by('created_on')
+        post = self.object
+        pageviews.record_view(self.request, post)
+        context['post_slug'] = post.slug
+        context['comments'], context['comments_next'] = get_comment_page(post.pk)
+        context['related_posts'] = related.get_related_posts(post)
         context.update(self.get_common_context())
         return context
     
+    def get_surrogate_keys(self, context):
+        """
+        Tags the page with the post, its categories and its archive periods.
+        """
+        post = self.object
+        keys = super().get_surrogate_keys(context) + [purge.post_key(post.pk)] + purge.archive_keys(post.created_on)
+        keys += [purge.category_key(category.slug) for category in post.categories.all()]
+        return keys
+    
     def post(self, request, *args, **kwargs):
         """
         Handles comment submission for the current post.
@@ -135,22 +191,41 @@ class PostDetail(BlogContextMixin, generic.DetailView):
         post = self.get_object()
         
         # Handle comment submission
-        name = request.POST.get('name')
-        email = request.POST.get('email')
-        content = request.POST.get('content')
+        submit_comment(request, post)
+        return redirect(post.get_absolute_url())
+
+class CommentFragment(generic.View):
+    """
+    View returning the next batch of approved comments as an HTML fragment.
+    
+    Used by main.js to load comments progressively below a post.
+    """
+    def get(self, request, slug):
+        """
+        Renders the batch of comments after the ``after`` cursor.
         
-        if name and email and content:
-            Comment.objects.create(
-                post=post,
-                name=name,
-                email=email,
-                content=content
-            )
-            messages.success(request, 'Your comment has been submitted and is awaiting approval.')
-        else:
-            messages.error(request, 'Please fill in all the required fields.')
+        Args:
+            request: HTTP request
+            slug: Post slug from URL
+            
+        Returns:
+            HttpResponse: Rendered comments and, if more remain, a "load more" link
+        """
+        post_id = Post.objects.filter(status=1, slug=slug).values_list('id', flat=True).first()
+        if post_id is None:
+            raise Http404("Post not found")
+        try:
+            comments, comments_next = get_comment_page(post_id, request.GET.get('after'))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid cursor")
         
-        return redirect(post.get_absolute_url())
+        context = {
+            'post_slug': slug,
+            'comments': comments,
+            'comments_next': comments_next,
+        }
+        response = render(request, 'blog/comment_list.html', context)
+        return purge.tag_response(response, [purge.post_key(post_id)])
 
 class CategoryView(BlogContextMixin, generic.ListView):
     """
@@ -166,14 +241,18 @@ class CategoryView(BlogContextMixin, generic.ListView):
         """
         Filters posts by the requested category slug.
         
-        Retrieves the Category object specified in the URL slug
-        and returns all published posts in that category.
+        Looks up the category specified in the URL slug and returns
+        all published posts in that category.
         
         Returns:
-            QuerySet: Published posts in the specified category
+            PostList: Published posts in the specified category, from the
+                in-memory post index
         """
-        self.category = get_object_or_404(Category, slug=self.kwargs['slug'])
-        return Post.objects.filter(categories=self.category, status=1).order_by('-created_on')
+        index = postindex.get_index()
+        self.category = index.category(self.kwargs['slug'])
+        if self.category is None:
+            raise Http404("Category not found")
+        return index.category_posts(self.category)
     
     def get_context_data(self, **kwargs):
         """
@@ -189,6 +268,12 @@ class CategoryView(BlogContextMixin, generic.ListView):
         context['category'] = self.category
         context.update(self.get_common_context())
         return context
+    
+    def get_surrogate_keys(self, context):
+        """
+        Adds the category key to the listing keys.
+        """
+        return super().get_surrogate_keys(context) + [purge.category_key(self.category.slug)]
 
 class ArchiveView(BlogContextMixin, generic.ListView):
     """
@@ -208,26 +293,20 @@ class ArchiveView(BlogContextMixin, generic.ListView):
         or from a specific month within a year.
         
         Returns:
-            QuerySet: Published posts filtered by date
+            PostList: Published posts filtered by date, from the in-memory
+                post index
         """
-        year = self.kwargs['year']
+        year = int(self.kwargs['year'])
         month = self.kwargs.get('month', None)
         
         if month:
             # Month archive view
-            self.date = datetime.date(year=int(year), month=int(month), day=1)
-            return Post.objects.filter(
-                created_on__year=year,
-                created_on__month=month,
-                status=1
-            ).order_by('-created_on')
+            month = int(month)
+            self.date = datetime.date(year=year, month=month, day=1)
         else:
             # Year archive view
-            self.date = datetime.date(year=int(year), month=1, day=1)
-            return Post.objects.filter(
-                created_on__year=year,
-                status=1
-            ).order_by('-created_on')
+            self.date = datetime.date(year=year, month=1, day=1)
+        return postindex.get_index().archive_posts(year, month)
     
     def get_context_data(self, **kwargs):
         """
@@ -253,6 +332,13 @@ class ArchiveView(BlogContextMixin, generic.ListView):
             context['archive_title'] = self.kwargs['year']
             
         return context
+    
+    def get_surrogate_keys(self, context):
+        """
+        Adds the year or month archive key to the listing keys.
+        """
+        archive_key = purge.archive_keys(self.date)[1 if 'month' in self.kwargs else 0]
+        return super().get_surrogate_keys(context) + [archive_key]
 
 def about(request):
     """
@@ -270,4 +356,39 @@ def about(request):
     # Create a mixin instance to access its methods
     mixin = BlogContextMixin()
     context = mixin.get_common_context()
-    return render(request, 'blog/about.html', context)
\ No newline at end of file
+    response = render(request, 'blog/about.html', context)
+    return purge.tag_response(response, [purge.SIDEBAR_KEY])
+
+class SitemapIndex(generic.View):
+    """
+    View for the sitemap index pointing search engines to every sitemap chunk.
+    """
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the sitemap index document.
+        
+        Returns:
+            HttpResponse: XML sitemap index
+        """
+        return HttpResponse(sitemaps.render_index(request), content_type='application/xml')
+
+class SitemapSection(generic.View):
+    """
+    View for a single chunk of the posts, categories or archives sitemap.
+    """
+    def get(self, request, section, chunk):
+        """
+        Returns the requested sitemap chunk.
+        
+        Args:
+            request: HTTP request
+            section: Sitemap section name from URL
+            chunk: One-based chunk number from URL
+            
+        Returns:
+            HttpResponse: XML urlset for the requested chunk
+        """
+        if section not in sitemaps.SECTIONS or not 1 <= chunk <= sitemaps.chunk_count(section):
+            raise Http404("Sitemap chunk does not exist")
+        xml = sitemaps.render_chunk(request, section, chunk - 1)
+        return HttpResponse(xml, content_type='application/xml')
@@ -5,6 +5,8 @@
  * - Mobile menu toggling for responsive design
  * - Auto-dismissing notification messages
  * - Copy buttons for code blocks to enhance user experience
+ * - Progressive loading of comments on post pages
+ * - Prefetching of the next listing page and of visible post links
  */
 
 document.addEventListener('DOMContentLoaded', function() {
@@ -48,6 +50,12 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Add copy functionality to code blocks
     addCopyCodeButtons();
+
+    // Load further comment batches on demand
+    setupCommentLoading();
+
+    // Fetch likely next pages while the user is reading
+    setupPrefetching();
 });
 
 /**
@@ -92,4 +100,142 @@ function addCopyCodeButtons() {
         // Add the button to the code block
         parentPre.appendChild(copyButton);
     });
-} 
\ No newline at end of file
+}
+
+/**
+ * Loads further batches of comments below a post
+ * 
+ * The post page only renders the first batch of comments followed by a
+ * "Load more comments" link pointing to the comment fragment endpoint.
+ * The next batch is fetched when that link is clicked or scrolls into view,
+ * and is inserted in place of the link (the fragment brings its own link
+ * when there are more comments to load).
+ */
+function setupCommentLoading() {
+    const commentsList = document.querySelector('.comments-list');
+    if (!commentsList) {
+        return;
+    }
+
+    let loading = false;
+    const observer = 'IntersectionObserver' in window
+        ? new IntersectionObserver(function(entries) {
+            entries.forEach(function(entry) {
+                if (entry.isIntersecting) {
+                    loadMore(entry.target);
+                }
+            });
+        }, { rootMargin: '200px' })
+        : null;
+
+    function watch() {
+        const link = commentsList.querySelector('.load-more-comments');
+        if (link && observer) {
+            observer.observe(link);
+        }
+    }
+
+    function loadMore(link) {
+        if (loading) {
+            return;
+        }
+        loading = true;
+        link.textContent = 'Loading...';
+        if (observer) {
+            observer.unobserve(link);
+        }
+
+        fetch(link.href, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.text();
+            })
+            .then(function(html) {
+                // Replace the link with the fetched comments (and next link, if any)
+                const template = document.createElement('template');
+                template.innerHTML = html;
+                link.replaceWith(template.content);
+                loading = false;
+                watch();
+            })
+            .catch(function() {
+                // Leave the link in place so the user can retry
+                link.textContent = 'Load more comments';
+                loading = false;
+            });
+    }
+
+    commentsList.addEventListener('click', function(event) {
+        const link = event.target.closest('.load-more-comments');
+        if (link) {
+            event.preventDefault();
+            loadMore(link);
+        }
+    });
+
+    watch();
+}
+
+/**
+ * Prefetches pages the reader is likely to open next
+ *
+ * The next page of a listing ("Next" pagination link) is prefetched once the
+ * browser is idle, and post links are prefetched when they scroll into view.
+ * Prefetched pages land in the HTTP cache, so the click that follows does
+ * not wait for a round trip. Nothing is prefetched when the user asked to
+ * save data or is on a slow connection, and each URL is fetched only once.
+ */
+function setupPrefetching() {
+    const connection = navigator.connection;
+    if (connection && (connection.saveData || /2g/.test(connection.effectiveType || ''))) {
+        return;
+    }
+
+    const maxPrefetches = 10;
+    const prefetched = new Set([location.href]);
+
+    function prefetch(href) {
+        if (prefetched.has(href) || prefetched.size > maxPrefetches) {
+            return;
+        }
+        prefetched.add(href);
+        const link = document.createElement('link');
+        link.rel = 'prefetch';
+        link.href = href;
+        document.head.appendChild(link);
+    }
+
+    const whenIdle = window.requestIdleCallback || function(callback) {
+        return setTimeout(callback, 1000);
+    };
+
+    // Next listing page
+    const next = document.querySelector('.pagination a[rel="next"]');
+    if (next) {
+        whenIdle(function() {
+            prefetch(next.href);
+        });
+    }
+
+    // Post links as they come into view
+    if (!('IntersectionObserver' in window)) {
+        return;
+    }
+    const observer = new IntersectionObserver(function(entries) {
+        entries.forEach(function(entry) {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                whenIdle(function() {
+                    prefetch(entry.target.href);
+                });
+            }
+        });
+    });
+    document.querySelectorAll('a[href*="/post/"]').forEach(function(link) {
+        if (link.origin === location.origin && !link.pathname.endsWith('/comments/')) {
+            observer.observe(link);
+        }
+    });
+}